@@ -0,0 +1 @@
+default_app_config = 'rpaper.apps.reservations.apps.ReservationsConfig'
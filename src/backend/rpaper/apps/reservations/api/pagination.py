@@ -0,0 +1,106 @@
+import operator
+from functools import reduce
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from ..models import Record
+
+
+class RecordKeysetPagination(BasePagination):
+    """A keyset pagination of records ordered by (start_at, end_at, pk)
+
+    The pagination is opt-in to keep the response of the list endpoint as a
+    plain list. It is enabled when 'cursor' or 'page_size' query parameter
+    is specified. Each page is fetched by a range query on the ordering so
+    a deep page costs as same as the first page.
+    """
+    ordering = ('start_at', 'end_at', 'pk')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = (self.cursor_query_param, self.page_size_query_param)
+        if not any(p in request.query_params for p in params):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            start_at, end_at, pk = cursor
+            # NOTE:
+            # The redundant lower bound lets the planner seek the index on
+            # (thing, start_at, end_at) instead of evaluating the OR alone.
+            queryset = queryset.filter(
+                Q(start_at__gte=start_at) & reduce(operator.or_, (
+                    Q(start_at__gt=start_at),
+                    Q(start_at=start_at, end_at__gt=end_at),
+                    Q(start_at=start_at, end_at=end_at, pk__gt=pk),
+                ))
+            )
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(
+            url, self.page_size_query_param, self.page_size,
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(last),
+        )
+
+    def encode_cursor(self, record):
+        # A record may be a dict obtained by 'values()'
+        if isinstance(record, dict):
+            start_at, end_at, pk = (record[f] for f in self.ordering)
+        else:
+            start_at, end_at, pk = (getattr(record, f) for f in self.ordering)
+        value = '|'.join((start_at.isoformat(), end_at.isoformat(), pk))
+        return urlsafe_b64encode(value.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            start_at, end_at, pk = value.split('|')
+            start_at = parse_datetime(start_at)
+            end_at = parse_datetime(end_at)
+            Record._meta.pk.decode_hashids(pk)
+        except (TypeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if start_at is None or end_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return start_at, end_at, pk
@@ -1,9 +1,21 @@
+import datetime
+from collections import OrderedDict
 from django.contrib.auth.models import User
-from rest_framework import serializers
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import serializers, ISO_8601
+from rest_framework.settings import api_settings
 from ..models import (
     Thing,
     Record,
 )
+from ..recurrence import (
+    FREQUENCIES,
+    MAX_INTERVAL,
+    MAX_OCCURRENCES,
+    TooManyOccurrences,
+    expand_recurrence,
+)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,6 +44,49 @@ class RecordSerializer(serializers.ModelSerializer):
     pk = serializers.RegexField('\w+', read_only=True)
 
 
+def format_datetime(value):
+    """Format a datetime as same as DateTimeField of REST framework"""
+    output_format = api_settings.DATETIME_FORMAT
+    if value is None:
+        return None
+    elif output_format is None or output_format.lower() != ISO_8601:
+        return serializers.DateTimeField().to_representation(value)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class RecordValuesSerializer:
+    """A read-only and fast counterpart of RecordSerializer
+
+    It serializes dicts from 'values()' of records into the same data as
+    RecordSerializer without per-field machinery of REST framework. Use
+    'get_values' to obtain the values queryset from a records queryset.
+    """
+    fields = RecordSerializer.Meta.fields
+    datetime_fields = ('start_at', 'end_at')
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    @classmethod
+    def get_values(cls, queryset):
+        return queryset.values(*cls.fields)
+
+    def to_representation(self, values):
+        datetime_fields = self.datetime_fields
+        return OrderedDict(
+            (name, format_datetime(values[name])
+             if name in datetime_fields else values[name])
+            for name in self.fields
+        )
+
+    @property
+    def data(self):
+        return [self.to_representation(values) for values in self.instance]
+
+
 class RecordSerializerWithCredential(RecordSerializer):
     class Meta:
         model = Record
@@ -48,6 +103,92 @@ class RecordSerializerWithCredential(RecordSerializer):
         read_only_fields = ('thing', 'pk', 'credential')
 
 
+class RecordListSerializer(serializers.ListSerializer):
+    # The maximum number of records created at once
+    MAX_RECORDS = MAX_OCCURRENCES
+
+    def to_internal_value(self, data):
+        # Reject a long list before each record is validated
+        if isinstance(data, list) and len(data) > self.MAX_RECORDS:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    _("Records could not be more than %d.") % (
+                        self.MAX_RECORDS,
+                    ),
+                ],
+            })
+        return super().to_internal_value(data)
+
+
+class RecordBulkSerializer(RecordSerializerWithCredential):
+    class Meta(RecordSerializerWithCredential.Meta):
+        list_serializer_class = RecordListSerializer
+
+
+class RecurringRecordSerializer(RecordSerializerWithCredential):
+    """A record with a recurrence rule which is expanded into occurrences"""
+    class Meta(RecordSerializerWithCredential.Meta):
+        fields = RecordSerializerWithCredential.Meta.fields + (
+            'frequency',
+            'interval',
+            'count',
+            'until',
+        )
+
+    frequency = serializers.ChoiceField(
+        choices=sorted(FREQUENCIES), write_only=True,
+    )
+    interval = serializers.IntegerField(
+        min_value=1, max_value=MAX_INTERVAL, default=1, write_only=True,
+    )
+    count = serializers.IntegerField(
+        min_value=1, max_value=MAX_OCCURRENCES, required=False,
+        write_only=True,
+    )
+    until = serializers.DateTimeField(required=False, write_only=True)
+
+    def validate(self, data):
+        if ('count' in data) == ('until' in data):
+            raise serializers.ValidationError(
+                _("Either 'count' or 'until' should be specified."),
+            )
+        elif 'until' in data and data['until'] < data['start_at']:
+            raise serializers.ValidationError(
+                _("'until' could not be a smaller value than 'start_at'."),
+            )
+        # The rule is expanded here so that invalid rules are reported
+        try:
+            data['occurrences'] = list(expand_recurrence(
+                data['start_at'],
+                data['end_at'],
+                frequency=data['frequency'],
+                interval=data['interval'],
+                count=data.get('count'),
+                until=data.get('until'),
+            ))
+        except TooManyOccurrences:
+            raise serializers.ValidationError(
+                _("The rule could not have more than %(max)d occurrences.")
+                % dict(max=MAX_OCCURRENCES),
+            )
+        except OverflowError:
+            raise serializers.ValidationError(
+                _("Occurrences of the rule are out of the range of dates."),
+            )
+        return data
+
+    def get_occurrences(self):
+        """Return a list of record attributes of each occurrence"""
+        data = dict(self.validated_data)
+        occurrences = data.pop('occurrences')
+        for name in ('frequency', 'interval', 'count', 'until'):
+            data.pop(name, None)
+        return [
+            dict(data, start_at=start_at, end_at=end_at)
+            for start_at, end_at in occurrences
+        ]
+
+
 class ThingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Thing
@@ -61,3 +202,103 @@ class ThingSerializer(serializers.ModelSerializer):
 
     pk = serializers.RegexField('\w+', read_only=True)
     owner = UserSerializer(many=False, read_only=True)
+
+
+class OccupancySerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField()
+    records = serializers.IntegerField()
+    minutes = serializers.SerializerMethodField()
+
+    def get_minutes(self, obj):
+        return obj['duration'] // datetime.timedelta(minutes=1)
+
+
+class TimeSpanQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField()
+    until = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['until'] <= data['since']:
+            raise serializers.ValidationError(
+                _("'until' should be a greater value than 'since'."),
+            )
+        return data
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    since_version = serializers.IntegerField(min_value=0)
+
+    def validate(self, data):
+        # A version is a timestamp in microseconds
+        try:
+            data['since'] = datetime.datetime.fromtimestamp(
+                data['since_version'] / 1000000,
+                tz=timezone.utc,
+            )
+        except (OverflowError, ValueError, OSError):
+            raise serializers.ValidationError({
+                'since_version': [_('Invalid version.')],
+            })
+        return data
+
+
+class CalendarQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+
+
+class AvailabilityQuerySerializer(TimeSpanQuerySerializer):
+    duration = serializers.DurationField()
+
+    def validate_duration(self, value):
+        if value <= datetime.timedelta():
+            raise serializers.ValidationError(
+                _("'duration' should be a positive value."),
+            )
+        return value
+
+
+class RecordShiftSerializer(serializers.Serializer):
+    offset = serializers.DurationField()
+
+    def validate_offset(self, value):
+        if not value:
+            raise serializers.ValidationError(
+                _("'offset' should be a non zero value."),
+            )
+        return value
+
+
+class ThingAvailabilityQuerySerializer(TimeSpanQuerySerializer):
+    things = serializers.CharField(required=False)
+
+    def validate_things(self, value):
+        hashids = [v for v in value.split(',') if v]
+        try:
+            Thing._meta.pk.decode_many(hashids)
+        except AttributeError:
+            raise serializers.ValidationError(
+                _("'things' should be a comma separated list of things."),
+            )
+        return hashids
+
+
+class BatchQuerySerializer(ThingAvailabilityQuerySerializer):
+    # The maximum number of things in a batch
+    MAX_THINGS = 100
+
+    things = serializers.CharField()
+
+    def validate_things(self, value):
+        hashids = super().validate_things(value)
+        if len(hashids) > self.MAX_THINGS:
+            raise serializers.ValidationError(
+                _("'things' could not contain more than %d things.") % (
+                    self.MAX_THINGS,
+                ),
+            )
+        return hashids
+
+
+class AvailabilitySerializer(serializers.Serializer):
+    start_at = serializers.DateTimeField()
+    end_at = serializers.DateTimeField()
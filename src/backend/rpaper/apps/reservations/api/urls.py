@@ -3,9 +3,18 @@ from rest_framework.urlpatterns import format_suffix_patterns
 
 from .views import (
     ThingCreateAPIView,
+    ThingAvailabilityAPIView,
+    ThingBatchAPIView,
     ThingRetrieveUpdateDestroyAPIView,
     RecordListCreateAPIView,
+    RecordBulkCreateAPIView,
+    RecordRecurringCreateAPIView,
+    RecordExportAPIView,
+    RecordChangesAPIView,
     RecordRetrieveUpdateDestroyAPIView,
+    RecordOccupancyAPIView,
+    RecordAvailabilityAPIView,
+    RecordCalendarAPIView,
 )
 
 
@@ -13,15 +22,45 @@ urlpatterns = [
     url(r'^$',
         ThingCreateAPIView.as_view(),
         name='things-list'),
+    url(r'^availability/$',
+        ThingAvailabilityAPIView.as_view(),
+        name='things-availability'),
+    url(r'^batch/$',
+        ThingBatchAPIView.as_view(),
+        name='things-batch'),
     url(r'^(?P<pk>\w+)/$',
         ThingRetrieveUpdateDestroyAPIView.as_view(),
         name='things-detail'),
     url(r'^(?P<thing_pk>\w+)/records/$',
         RecordListCreateAPIView.as_view(),
         name='records-list'),
+    url(r'^(?P<thing_pk>\w+)/records/bulk/$',
+        RecordBulkCreateAPIView.as_view(),
+        name='records-bulk'),
+    url(r'^(?P<thing_pk>\w+)/records/recurring/$',
+        RecordRecurringCreateAPIView.as_view(),
+        name='records-recurring'),
+    url(r'^(?P<thing_pk>\w+)/records/export/$',
+        RecordExportAPIView.as_view(),
+        name='records-export'),
+    url(r'^(?P<thing_pk>\w+)/records/changes/$',
+        RecordChangesAPIView.as_view(),
+        name='records-changes'),
     url(r'^(?P<thing_pk>\w+)/records/(?P<pk>\w+)/$',
         RecordRetrieveUpdateDestroyAPIView.as_view(),
         name='records-detail'),
+    url(r'^(?P<thing_pk>\w+)/occupancy/$',
+        RecordOccupancyAPIView.as_view(),
+        name='records-occupancy'),
+    url(r'^(?P<thing_pk>\w+)/availability/$',
+        RecordAvailabilityAPIView.as_view(),
+        name='records-availability'),
+    url(r'^(?P<thing_pk>\w+)/calendar/$',
+        RecordCalendarAPIView.as_view(),
+        name='records-calendar'),
 ]
 
-urlpatterns = format_suffix_patterns(urlpatterns, allowed=['json', 'html'])
+urlpatterns = format_suffix_patterns(
+    urlpatterns,
+    allowed=['json', 'html', 'ics'],
+)
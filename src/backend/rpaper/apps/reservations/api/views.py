@@ -1,4 +1,20 @@
+import hashlib
+import datetime
+from collections import OrderedDict
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.utils.translation import ugettext_lazy as _
+from django.db import transaction, IntegrityError
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ValidationError, APIException
 from rest_framework.permissions import (
     SAFE_METHODS,
     DjangoModelPermissions,
@@ -6,23 +22,50 @@ from rest_framework.permissions import (
     DjangoModelPermissionsOrAnonReadOnly,
 )
 from rest_framework.generics import (
+    GenericAPIView,
+    ListAPIView,
     CreateAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
 )
 from rpaper.core.utils import get_client_ip
+from .pagination import RecordKeysetPagination
+from .renderers import ICalendarRenderer
 from .serializer import (
     ThingSerializer,
     RecordSerializer,
     RecordSerializerWithCredential,
+    RecordBulkSerializer,
+    RecordValuesSerializer,
+    RecurringRecordSerializer,
+    RecordShiftSerializer,
+    OccupancySerializer,
+    AvailabilitySerializer,
+    TimeSpanQuerySerializer,
+    CalendarQuerySerializer,
+    ChangesQuerySerializer,
+    AvailabilityQuerySerializer,
+    ThingAvailabilityQuerySerializer,
+    BatchQuerySerializer,
 )
 from ..models import (
     Thing,
     Record,
+    RecordTombstone,
+)
+from ..perms import get_modifiable_records_filter
+from ..signals import defer_record_tombstones
+from ..ics import build_event, iter_calendar
+from ..cache import (
+    get_thing_version,
+    get_thing_cache_key,
 )
 from ..filters import RecordFilter
 
 
+NON_FIELD_ERRORS_KEY = api_settings.NON_FIELD_ERRORS_KEY
+
+
 class DjangoObjectPermissionsOrAnonReadOnly(DjangoObjectPermissions):
     authenticated_users_only = False
 
@@ -37,9 +80,81 @@ class DjangoObjectPermissionsOrAnonReadOnly(DjangoObjectPermissions):
         return super().has_object_permission(request, view, obj)
 
 
+class ThingCacheMixin:
+    """Cache serialized data of GET responses per a version of a thing
+
+    The version is bumped whenever the thing or its records are saved or
+    deleted so cached data never outlive the change. The version is also
+    used as an ETag and Last-Modified of responses so conditional GETs are
+    answered without touching the DB.
+    """
+    cache_thing_url_kwarg = 'thing_pk'
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_key(self, version):
+        request = self.request
+        return get_thing_cache_key(
+            self.kwargs[self.cache_thing_url_kwarg],
+            version,
+            type(self).__name__,
+            sorted(self.kwargs.items()),
+            sorted(request.query_params.lists()),
+        )
+
+    def get_cache_validators(self):
+        """Return a cache key, an ETag and Last-Modified of the response"""
+        version, modified = get_thing_version(
+            self.kwargs[self.cache_thing_url_kwarg],
+        )
+        key = self.get_cache_key(version)
+        etag = '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+        return key, etag, int(modified)
+
+    def cached(self, method, request, *args, **kwargs):
+        key, etag, last_modified = self.get_cache_validators()
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is not None:
+            return response
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = method(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if isinstance(response.data, list):
+                data = list(response.data)
+            else:
+                data = OrderedDict(response.data)
+            cache.set(key, data, self.cache_timeout)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
 class ThingAPIViewMixin:
     serializer_class = ThingSerializer
-    queryset = Thing.objects.all()
+    queryset = Thing.objects.select_related('owner')
+    # Columns which are required to serialize a thing by ThingSerializer
+    serializer_columns = (
+        'hashid',
+        'name',
+        'remarks',
+        'thumbnail',
+        'owner__username',
+        'owner__email',
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Unsafe methods save the object so all columns should be loaded
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.only(*self.serializer_columns)
+        return queryset
 
 
 class ThingCreateAPIView(ThingAPIViewMixin, CreateAPIView):
@@ -55,33 +170,231 @@ class ThingCreateAPIView(ThingAPIViewMixin, CreateAPIView):
         )
 
 
-class ThingRetrieveUpdateDestroyAPIView(ThingAPIViewMixin,
+class ThingRetrieveUpdateDestroyAPIView(ThingCacheMixin,
+                                        ThingAPIViewMixin,
                                         RetrieveUpdateDestroyAPIView):
     permission_classes = (
         DjangoObjectPermissionsOrAnonReadOnly,
     )
+    cache_thing_url_kwarg = 'pk'
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+
+class ThingAvailabilityAPIView(ThingAPIViewMixin, ListAPIView):
+    """Return things which have no record between 'since' and 'until'"""
+
+    def get_queryset(self):
+        query = ThingAvailabilityQuerySerializer(
+            data=self.request.query_params,
+        )
+        query.is_valid(raise_exception=True)
+        queryset = super().get_queryset()
+        if 'things' in query.validated_data:
+            queryset = queryset.filter(pk__in=query.validated_data['things'])
+        return queryset.available_between(
+            query.validated_data['since'],
+            query.validated_data['until'],
+        )
+
+
+class ThingBatchAPIView(ThingAPIViewMixin, GenericAPIView):
+    """Return things and their records between 'since' and 'until' at once
+
+    Things are returned in the order of 'things' and missing ones are
+    omitted. Records of all things are fetched by a single range query and
+    grouped by things.
+    """
+
+    def get(self, request, *args, **kwargs):
+        query = BatchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        hashids = list(OrderedDict.fromkeys(query.validated_data['things']))
+        since = query.validated_data['since']
+        until = query.validated_data['until']
+
+        things = self.get_queryset().in_bulk(hashids)
+        queryset = Record.objects.filter(
+            thing_id__in=hashids,
+            # Bound the range scan on 'start_at' like '_may_collide_with'
+            start_at__gt=Record.get_start_at_bound(since),
+            start_at__lte=until,
+            end_at__gte=since,
+        )
+        values = RecordValuesSerializer.get_values(queryset)
+        records = dict((pk, []) for pk in hashids)
+        for record in RecordValuesSerializer(values).data:
+            records[record['thing']].append(record)
+
+        serializer = self.get_serializer(
+            [things[pk] for pk in hashids if pk in things],
+            many=True,
+        )
+        return Response([
+            OrderedDict([
+                ('thing', thing),
+                ('records', records[thing['pk']]),
+            ])
+            for thing in serializer.data
+        ])
 
 
 class RecordAPIViewMixin:
     serializer_class = RecordSerializer
+    # Columns which are required to serialize a record by RecordSerializer
+    serializer_columns = (
+        'hashid',
+        'thing',
+        'name',
+        'contact',
+        'remarks',
+        'start_at',
+        'end_at',
+    )
 
     def get_thing(self):
+        # The thing is resolved at most once per request
+        if not hasattr(self, '_thing'):
+            self._thing = get_object_or_404(Thing, pk=self.get_thing_pk())
+        return self._thing
+
+    def get_thing_pk(self):
         thing_pk = self.kwargs['thing_pk']
-        return get_object_or_404(Thing, pk=thing_pk)
+        try:
+            Thing._meta.pk.decode_hashids(thing_pk)
+        except AttributeError:
+            raise Http404
+        return thing_pk
+
+    def check_thing_exists(self):
+        """Raise Http404 when the thing does not exist
+
+        It is called only when an empty result cannot tell whether the thing
+        exists, and probes the existence without fetching the thing.
+        """
+        if hasattr(self, '_thing'):
+            return
+        elif not Thing.objects.filter(pk=self.get_thing_pk()).exists():
+            raise Http404
 
     def get_queryset(self):
-        return Record.objects.filter(
-            thing=self.get_thing(),
+        # NOTE:
+        # Records are filtered by the 'thing_id' directly so the thing is
+        # not fetched just to build the queryset (permission classes call
+        # this method as well).
+        queryset = Record.objects.filter(
+            thing_id=self.get_thing_pk(),
         )
+        # Unsafe methods save the object or check its permission with
+        # 'owner' and 'credential' so all columns should be loaded
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.only(*self.serializer_columns)
+        return queryset
+
 
+class RecordBulkUpdateMixin:
+    """Delete or shift all records in a time window with a few queries
 
-class RecordListCreateAPIView(RecordAPIViewMixin,
+    The time window is specified by RecordFilter parameters and both
+    'since' and 'until' are required to prevent an accidental operation on
+    all records of a thing. The request is rejected when the window
+    contains any record which the user cannot modify.
+    """
+
+    def get_window_queryset(self):
+        query = TimeSpanQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        return self.filter_queryset(self.get_queryset())
+
+    def check_window_permissions(self, queryset):
+        """Reject the request or return modifiable records in the window
+
+        Records are filtered by the permission again so records inserted
+        or reassigned by a concurrent request after the check are never
+        modified by the request.
+        """
+        modifiable = get_modifiable_records_filter(self.request.user)
+        if queryset.exclude(modifiable).exists():
+            self.permission_denied(self.request)
+        return queryset.filter(modifiable)
+
+    def delete(self, request, *args, **kwargs):
+        queryset = self.get_window_queryset()
+        with transaction.atomic():
+            queryset = self.check_window_permissions(queryset)
+            # NOTE:
+            # Records are deleted by a set-based DELETE but 'post_delete'
+            # signals are still sent so caches and subscribers follow.
+            # Their tombstones are inserted at once as well.
+            with defer_record_tombstones():
+                deleted, _rows = queryset.delete()
+            if not deleted:
+                self.check_thing_exists()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def patch(self, request, *args, **kwargs):
+        queryset = self.get_window_queryset()
+        serializer = RecordShiftSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        offset = serializer.validated_data['offset']
+        with transaction.atomic():
+            queryset = self.check_window_permissions(queryset)
+            # Records are locked before they are read so they are shifted
+            # from their latest values
+            Record.objects.lock_for_collision(
+                Record(thing_id=self.get_thing_pk()),
+            )
+            records = list(queryset.select_for_update())
+            if not records:
+                self.check_thing_exists()
+            try:
+                with transaction.atomic():
+                    errors = Record.objects.shift_many(records, offset)
+            except IntegrityError as e:
+                # A concurrent request has inserted a collided record
+                if Record.OVERLAP_CONSTRAINT_NAME not in str(e):
+                    raise
+                # 'records' are left shifted in memory to find collisions
+                errors = Record.objects.validate_many(records)
+                # Records were not shifted in the DB so never return them
+                if not any(errors):
+                    raise
+        if any(errors):
+            return validation_errors_response(errors)
+        serializer = RecordSerializer(records, many=True)
+        return Response(serializer.data)
+
+
+class RecordListCreateAPIView(ThingCacheMixin,
+                              RecordBulkUpdateMixin,
+                              RecordAPIViewMixin,
                               ListCreateAPIView):
     queryset = Thing.objects.all()
     permission_classes = (
         DjangoModelPermissionsOrAnonReadOnly,
     )
     filter_class = RecordFilter
+    pagination_class = RecordKeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(self.list_records, request, *args, **kwargs)
+
+    def list_records(self, request, *args, **kwargs):
+        # NOTE:
+        # Records are fetched by 'values()' and serialized by a read-only
+        # serializer which returns the same data as RecordSerializer.
+        queryset = self.filter_queryset(self.get_queryset())
+        values = RecordValuesSerializer.get_values(queryset)
+        page = self.paginate_queryset(values)
+        records = RecordValuesSerializer(
+            values if page is None else page
+        ).data
+        if not records:
+            self.check_thing_exists()
+        if page is not None:
+            return self.get_paginated_response(records)
+        return Response(records)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -98,14 +411,327 @@ class RecordListCreateAPIView(RecordAPIViewMixin,
         return RecordSerializer
 
 
-class RecordRetrieveUpdateDestroyAPIView(RecordAPIViewMixin,
+def iter_json_array(items, chunk_size=100):
+    """Yield a JSON array of items in chunks of 'chunk_size' items"""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    chunk = []
+    prefix = '['
+    for item in items:
+        chunk.append(encoder.encode(item))
+        if len(chunk) == chunk_size:
+            yield prefix + ','.join(chunk)
+            chunk = []
+            prefix = ','
+    if chunk or prefix == '[':
+        yield prefix + ','.join(chunk) + ']'
+    else:
+        yield ']'
+
+
+def validation_errors_response(errors):
+    """Return a 400 response of ValidationError (or None) per record"""
+    return Response([
+        {} if e is None else {NON_FIELD_ERRORS_KEY: e.messages}
+        for e in errors
+    ], status=status.HTTP_400_BAD_REQUEST)
+
+
+class RecordBulkCreateMixin:
+    """Validate and insert records of a thing with a few queries"""
+    # The number of records inserted by a query
+    batch_size = 100
+
+    def create_records(self, records):
+        with transaction.atomic():
+            if records:
+                Record.objects.lock_for_collision(records[0])
+            errors = Record.objects.validate_many(records)
+            if not any(errors):
+                try:
+                    with transaction.atomic():
+                        Record.objects.bulk_create(
+                            records, batch_size=self.batch_size,
+                        )
+                except IntegrityError as e:
+                    # A concurrent request has inserted a collided record
+                    if Record.OVERLAP_CONSTRAINT_NAME not in str(e):
+                        raise
+                    errors = Record.objects.validate_many(records)
+                    # Records were not inserted so never return them
+                    if not any(errors):
+                        raise
+        if any(errors):
+            return validation_errors_response(errors)
+        serializer = RecordSerializerWithCredential(records, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class RecordBulkCreateAPIView(RecordBulkCreateMixin,
+                              RecordAPIViewMixin,
+                              GenericAPIView):
+    """Create records of a thing from a list at once"""
+    serializer_class = RecordBulkSerializer
+    permission_classes = (
+        DjangoModelPermissionsOrAnonReadOnly,
+    )
+
+    def post(self, request, *args, **kwargs):
+        thing = self.get_thing()
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        owner = user if user.is_authenticated() else None
+        ipaddress = get_client_ip(request)
+        records = [
+            Record(thing=thing, owner=owner, ipaddress=ipaddress, **data)
+            for data in serializer.validated_data
+        ]
+        return self.create_records(records)
+
+
+class RecordRecurringCreateAPIView(RecordBulkCreateMixin,
+                                   RecordAPIViewMixin,
+                                   GenericAPIView):
+    """Create all occurrences of a recurring record at once"""
+    serializer_class = RecurringRecordSerializer
+    permission_classes = (
+        DjangoModelPermissionsOrAnonReadOnly,
+    )
+
+    def post(self, request, *args, **kwargs):
+        thing = self.get_thing()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        owner = user if user.is_authenticated() else None
+        ipaddress = get_client_ip(request)
+        records = [
+            Record(thing=thing, owner=owner, ipaddress=ipaddress, **data)
+            for data in serializer.get_occurrences()
+        ]
+        return self.create_records(records)
+
+
+class RecordExportAPIView(RecordAPIViewMixin, GenericAPIView):
+    """Stream all records of a thing as a JSON array
+
+    Records are iterated with 'iterator()' (a server-side cursor on
+    PostgreSQL) and written in chunks so the memory usage does not depend
+    on the number of records.
+    """
+    filter_class = RecordFilter
+    chunk_size = 100
+
+    def get(self, request, *args, **kwargs):
+        # The status code could not be changed once streaming has started
+        self.check_thing_exists()
+        queryset = self.filter_queryset(self.get_queryset())
+        values = RecordValuesSerializer.get_values(queryset)
+        serializer = RecordValuesSerializer(values)
+        records = map(serializer.to_representation, values.iterator())
+        return StreamingHttpResponse(
+            iter_json_array(records, self.chunk_size),
+            content_type='application/json',
+        )
+
+
+class RecordCalendarAPIView(ThingCacheMixin,
+                            RecordAPIViewMixin,
+                            GenericAPIView):
+    """Return records of a thing as an iCalendar feed
+
+    Only records which end after 'since' (30 days ago by default) are
+    included so polling of calendar clients is answered by a range scan of
+    the index. The feed is streamed from the DB and cached per a version of
+    the thing at the same time.
+    """
+    renderer_classes = (ICalendarRenderer,)
+    content_type = 'text/calendar; charset=utf-8'
+    default_period = datetime.timedelta(days=30)
+
+    def get_since(self):
+        query = CalendarQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        if 'since' in query.validated_data:
+            return query.validated_data['since']
+        # Round down to a day so the cache key changes once a day
+        since = timezone.now() - self.default_period
+        return since.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def get_cache_key(self, version):
+        return get_thing_cache_key(
+            self.kwargs[self.cache_thing_url_kwarg],
+            version,
+            type(self).__name__,
+            self.since.isoformat(),
+        )
+
+    def handle_exception(self, exc):
+        # Errors are not an iCalendar so they are rendered as JSON
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def get(self, request, *args, **kwargs):
+        self.since = self.get_since()
+        key, etag, last_modified = self.get_cache_validators()
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is not None:
+            return response
+        body = cache.get(key)
+        if body is not None:
+            response = HttpResponse(body, content_type=self.content_type)
+        else:
+            thing = self.get_thing()
+            response = StreamingHttpResponse(
+                self.cache_chunks(key, iter_calendar(
+                    thing.name,
+                    self.iter_events(thing),
+                )),
+                content_type=self.content_type,
+            )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def iter_events(self, thing):
+        queryset = self.get_queryset().filter(
+            # Bound the range scan on 'start_at' like '_may_collide_with'
+            start_at__gt=Record.get_start_at_bound(self.since),
+            end_at__gt=self.since,
+        ).values_list(
+            'hashid', 'name', 'remarks', 'start_at', 'end_at', 'updated_at',
+        )
+        rows = queryset.iterator()
+        for pk, name, remarks, start_at, end_at, updated_at in rows:
+            yield build_event(
+                '%s@%s' % (pk, thing.pk),
+                name,
+                start_at,
+                end_at,
+                updated_at,
+                description=remarks,
+            )
+
+    def cache_chunks(self, key, chunks):
+        body = []
+        for chunk in chunks:
+            body.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(body), self.cache_timeout)
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _('The version is too old to sync. Reload records.')
+    default_code = 'sync_expired'
+
+
+class RecordChangesAPIView(RecordAPIViewMixin, GenericAPIView):
+    """Return records changed and deleted since a version
+
+    A version is a timestamp in microseconds. Clients start from version 0
+    which returns all records, keep the returned 'version' and send it back
+    as 'since_version' in the next request. Changes in 'sync_margin' before
+    the version are returned again since a transaction may commit a bit
+    later than its 'updated_at'.
+    """
+    sync_margin = datetime.timedelta(minutes=1)
+
+    def get(self, request, *args, **kwargs):
+        query = ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        now = timezone.now()
+        version = int(now.timestamp() * 1000000)
+        queryset = self.get_queryset()
+        deleted = []
+        if query.validated_data['since_version']:
+            since = query.validated_data['since']
+            if since < now - RecordTombstone.RETENTION:
+                raise SyncExpired
+            since -= self.sync_margin
+            queryset = queryset.filter(updated_at__gte=since)
+            tombstones = RecordTombstone.objects.of_thing(
+                self.get_thing_pk(),
+            ).filter(deleted_at__gte=since).values_list('record', flat=True)
+            deleted = Record._meta.pk.encode_many(tombstones)
+        records = RecordValuesSerializer(
+            RecordValuesSerializer.get_values(queryset)
+        ).data
+        if not records and not deleted:
+            self.check_thing_exists()
+        return Response(OrderedDict([
+            ('version', version),
+            ('records', records),
+            ('deleted', deleted),
+        ]))
+
+
+class RecordRetrieveUpdateDestroyAPIView(ThingCacheMixin,
+                                         RecordAPIViewMixin,
                                          RetrieveUpdateDestroyAPIView):
     permission_classes = (
         DjangoObjectPermissionsOrAnonReadOnly,
     )
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.request.method == 'PUT':
             # Return 'credential' when the object has updated
             return RecordSerializerWithCredential
         return RecordSerializer
+
+
+class RecordOccupancyAPIView(RecordAPIViewMixin, GenericAPIView):
+    """Return busy minutes and the number of records per day or hour"""
+    serializer_class = OccupancySerializer
+    filter_class = RecordFilter
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in queryset.OCCUPANCY_BUCKETS:
+            raise ValidationError({
+                'bucket': [_('"%s" is not a valid choice.') % bucket],
+            })
+        # Records crossing the window are clipped to 'since' and 'until'
+        window = self.filter_class(request.query_params)
+        window.form.is_valid()
+        occupancy = [
+            dict(bucket=lower, records=records, duration=duration)
+            for lower, records, duration in queryset.occupancy(
+                bucket,
+                since=window.form.cleaned_data.get('since'),
+                until=window.form.cleaned_data.get('until'),
+            )
+        ]
+        if not occupancy:
+            self.check_thing_exists()
+        serializer = self.get_serializer(occupancy, many=True)
+        return Response(serializer.data)
+
+
+class RecordAvailabilityAPIView(RecordAPIViewMixin, GenericAPIView):
+    """Return free time-spans of a thing longer than 'duration'"""
+    serializer_class = AvailabilitySerializer
+
+    def get(self, request, *args, **kwargs):
+        query = AvailabilityQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        # Free slots are returned even for a thing without records
+        self.check_thing_exists()
+        queryset = self.get_queryset()
+        availability = [
+            dict(start_at=start_at, end_at=end_at)
+            for start_at, end_at in queryset.free_slots(
+                **query.validated_data
+            )
+        ]
+        serializer = self.get_serializer(availability, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class ReservationsConfig(AppConfig):
+    name = 'rpaper.apps.reservations'
+    verbose_name = _('Reservations')
+
+    def ready(self):
+        from . import signals  # noqa: F401
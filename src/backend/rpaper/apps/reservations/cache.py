@@ -0,0 +1,53 @@
+import time
+import hashlib
+from functools import partial
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'reservations:thing:%s:version'
+MODIFIED_KEY = 'reservations:thing:%s:modified'
+RESPONSE_KEY = 'reservations:thing:%s:%s:%s'
+
+# NOTE:
+# Versions are created for any thing id in URLs, even for things which do
+# not exist, so they expire like cached responses. An expired version is
+# restarted from the current time so stale entries are never reused.
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+def get_thing_version(thing_pk):
+    """Return a current cache version and a last modified time of a thing"""
+    keys = (VERSION_KEY % thing_pk, MODIFIED_KEY % thing_pk)
+    values = cache.get_many(keys)
+    if len(values) != len(keys):
+        # NOTE:
+        # Start from the current time instead of 1 so that entries cached
+        # with a version which has been evicted are never reused.
+        now = time.time()
+        cache.add(keys[0], int(now * 1000000), timeout=VERSION_TIMEOUT)
+        cache.add(keys[1], now, timeout=VERSION_TIMEOUT)
+        values = cache.get_many(keys)
+    return values.get(keys[0]), values.get(keys[1])
+
+
+def bump_thing_version(thing_pk):
+    """Invalidate all cached entries of a thing"""
+    cache.set(MODIFIED_KEY % thing_pk, time.time(), timeout=VERSION_TIMEOUT)
+    try:
+        cache.incr(VERSION_KEY % thing_pk)
+    except ValueError:
+        get_thing_version(thing_pk)
+
+
+def bump_thing_version_on_commit(thing_pk):
+    """Invalidate all cached entries of a thing when the transaction commits"""
+    # NOTE:
+    # A request which reads the thing before the commit would cache the old
+    # data with the new version if the version were bumped immediately.
+    transaction.on_commit(partial(bump_thing_version, thing_pk))
+
+
+def get_thing_cache_key(thing_pk, version, *parts):
+    """Return a cache key of a thing which is valid in the version"""
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return RESPONSE_KEY % (thing_pk, version, digest)
@@ -3,10 +3,7 @@ from .models import Record
 
 
 class RecordFilter(filters.FilterSet):
-    since = filters.IsoDateTimeFilter(
-        name='end_at',
-        lookup_expr='gte',
-    )
+    since = filters.IsoDateTimeFilter(method='filter_since')
     until = filters.IsoDateTimeFilter(
         name='start_at',
         lookup_expr='lte',
@@ -15,3 +12,13 @@ class RecordFilter(filters.FilterSet):
     class Meta:
         model = Record
         fields = ['since', 'until']
+
+    def filter_since(self, queryset, name, value):
+        # NOTE:
+        # The bound on 'start_at' lets the DB scan the index on
+        # (thing, start_at, end_at) from near 'since' instead of from the
+        # first record of the thing.
+        return queryset.filter(
+            start_at__gt=Record.get_start_at_bound(value),
+            end_at__gte=value,
+        )
@@ -0,0 +1,69 @@
+from pytz import UTC
+
+
+PRODID = '-//rpaper//reservations//EN'
+
+# The maximum length of a content line in octets without CRLF
+MAX_LINE_OCTETS = 75
+
+
+def escape_text(value):
+    return (
+        value.replace('\\', '\\\\')
+             .replace(';', '\\;')
+             .replace(',', '\\,')
+             .replace('\r\n', '\\n')
+             .replace('\n', '\\n')
+    )
+
+
+def format_datetime(value):
+    return value.astimezone(UTC).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold_line(line):
+    """Return a content line folded into lines of MAX_LINE_OCTETS octets"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + '\r\n'
+    lines = []
+    limit = MAX_LINE_OCTETS
+    while encoded:
+        # Do not split a multi-byte character
+        end = min(limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        lines.append(encoded[:end].decode('utf-8'))
+        encoded = encoded[end:]
+        # A continuation line starts with a space
+        limit = MAX_LINE_OCTETS - 1
+    return '\r\n '.join(lines) + '\r\n'
+
+
+def build_event(uid, summary, start_at, end_at, stamp, description=''):
+    lines = [
+        'BEGIN:VEVENT',
+        'UID:%s' % uid,
+        'DTSTAMP:%s' % format_datetime(stamp),
+        'DTSTART:%s' % format_datetime(start_at),
+        'DTEND:%s' % format_datetime(end_at),
+        'SUMMARY:%s' % escape_text(summary),
+    ]
+    if description:
+        lines.append('DESCRIPTION:%s' % escape_text(description))
+    lines.append('END:VEVENT')
+    return ''.join(map(fold_line, lines))
+
+
+def iter_calendar(name, events):
+    """Yield an iCalendar text of events built by 'build_event'"""
+    yield ''.join(map(fold_line, (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:%s' % PRODID,
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:%s' % escape_text(name),
+    )))
+    for event in events:
+        yield event
+    yield fold_line('END:VCALENDAR')
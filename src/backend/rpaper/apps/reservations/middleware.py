@@ -1,9 +1,21 @@
-from threading import local
+import uuid
+from rpaper.core.utils import ContextVar
 
-_threadlocal = local()
+
+_record_credential = ContextVar(
+    'reservations_record_credential',
+    default=None,
+)
+_record_credentials = ContextVar(
+    'reservations_record_credentials',
+    default=(),
+)
 
 HEADER_NAME = 'X-RESERVATIONS-RECORD-CREDENTIAL'
 
+# The maximum number of credentials accepted in a header
+MAX_CREDENTIALS = 100
+
 
 class RecordCredentialMiddleware:
 
@@ -12,16 +24,55 @@ class RecordCredentialMiddleware:
 
     def __call__(self, request):
         # NOTE:
-        # The credential is stored in a threadlocal so each requests should
-        # have a different thread-local value. But in case, the credential
-        # should always be updated to prevent accidental leak.
-        set_record_credential(request.META.get(HEADER_NAME, None))
-        return self.get_response(request)
+        # The credential is stored in a context variable so concurrent
+        # requests in a same thread (e.g. async workers) never see others.
+        # It is restored after the response to prevent accidental leak.
+        token = set_record_credential(request.META.get(HEADER_NAME, None))
+        try:
+            return self.get_response(request)
+        finally:
+            reset_record_credential(token)
+
+
+def parse_record_credentials(value):
+    """Return a tuple of normalized credentials in a comma separated value
+
+    Invalid credentials are ignored and at most MAX_CREDENTIALS credentials
+    are returned.
+    """
+    if not value:
+        return ()
+    credentials = []
+    for credential in value.split(',')[:MAX_CREDENTIALS]:
+        try:
+            credentials.append(str(uuid.UUID(credential.strip())))
+        except ValueError:
+            continue
+    return tuple(credentials)
 
 
 def get_record_credential():
-    return getattr(_threadlocal, 'reservations_record_credential', None)
+    return _record_credential.get()
+
+
+def get_record_credentials():
+    """Return a tuple of credentials specified in the current request"""
+    return _record_credentials.get()
 
 
 def set_record_credential(value):
-    setattr(_threadlocal, 'reservations_record_credential', value)
+    """Set a credential of the current context and return a reset token
+
+    Credentials in the value are parsed here once per request instead of
+    on every permission check.
+    """
+    return (
+        _record_credential.set(value),
+        _record_credentials.set(parse_record_credentials(value)),
+    )
+
+
+def reset_record_credential(token):
+    """Restore a credential of the current context by a reset token"""
+    _record_credential.reset(token[0])
+    _record_credentials.reset(token[1])
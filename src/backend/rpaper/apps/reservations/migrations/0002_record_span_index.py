@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:35
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+RANGE_INDEX_NAME = 'reservations_record_range_idx'
+
+
+def create_range_index(apps, schema_editor):
+    # NOTE:
+    # PostgreSQL can index the time-span of a record as a 'tstzrange' with
+    # GiST so overlap probes stay logarithmic. Other backends only get the
+    # composite B-tree index above.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Record = apps.get_model('reservations', 'Record')
+    quote_name = schema_editor.quote_name
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        "CREATE INDEX %s ON %s USING gist "
+        "(%s, tstzrange(%s, %s, '[)'))" % (
+            quote_name(RANGE_INDEX_NAME),
+            quote_name(Record._meta.db_table),
+            quote_name('thing_id'),
+            quote_name('start_at'),
+            quote_name('end_at'),
+        )
+    )
+
+
+def drop_range_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS %s' % schema_editor.quote_name(RANGE_INDEX_NAME)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['thing', 'start_at', 'end_at'], name='reservations_record_span_idx'),
+        ),
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+CONSTRAINT_NAME = 'reservations_record_no_overlap'
+RANGE_INDEX_NAME = 'reservations_record_range_idx'
+
+
+# The maximum number of overlapping pairs reported
+MAX_REPORTED_OVERLAPS = 100
+
+
+def check_overlapping_records(Record, schema_editor):
+    """Raise RuntimeError when records overlap each other
+
+    Records saved before the constraint may overlap because of the race of
+    the old check-then-insert. PostgreSQL refuses to add the constraint in
+    that case so the overlapping pairs are reported instead of a raw error.
+    """
+    quote_name = schema_editor.quote_name
+    sql = (
+        "SELECT a.%(pk)s, b.%(pk)s, a.%(thing)s FROM %(table)s a "
+        "INNER JOIN %(table)s b ON a.%(thing)s = b.%(thing)s "
+        "AND a.%(pk)s < b.%(pk)s "
+        "AND a.%(start_at)s < b.%(end_at)s "
+        "AND b.%(start_at)s < a.%(end_at)s "
+        "ORDER BY a.%(thing)s, a.%(start_at)s "
+        "LIMIT %(limit)d"
+    ) % dict(
+        pk=quote_name(Record._meta.pk.column),
+        thing=quote_name('thing_id'),
+        start_at=quote_name('start_at'),
+        end_at=quote_name('end_at'),
+        table=quote_name(Record._meta.db_table),
+        limit=MAX_REPORTED_OVERLAPS,
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+        overlaps = cursor.fetchall()
+    if not overlaps:
+        return
+    raise RuntimeError(
+        "Records overlap each other so the constraint '%s' could not be "
+        "added. Delete or move one record of each pair below (ids in the "
+        "database, at most %d pairs are listed) and run the migration "
+        "again.\n%s" % (
+            CONSTRAINT_NAME,
+            MAX_REPORTED_OVERLAPS,
+            '\n'.join(
+                'thing %s: record %s overlaps record %s' % (thing, a, b)
+                for a, b, thing in overlaps
+            ),
+        )
+    )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # NOTE:
+    # The exclusion constraint is backed by its own GiST index so the range
+    # index created in 0002 is replaced by the constraint.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Record = apps.get_model('reservations', 'Record')
+    check_overlapping_records(Record, schema_editor)
+    quote_name = schema_editor.quote_name
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS %s' % quote_name(RANGE_INDEX_NAME)
+    )
+    schema_editor.execute(
+        "ALTER TABLE %s ADD CONSTRAINT %s EXCLUDE USING gist "
+        "(%s WITH =, tstzrange(%s, %s, '[)') WITH &&)" % (
+            quote_name(Record._meta.db_table),
+            quote_name(CONSTRAINT_NAME),
+            quote_name('thing_id'),
+            quote_name('start_at'),
+            quote_name('end_at'),
+        )
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Record = apps.get_model('reservations', 'Record')
+    quote_name = schema_editor.quote_name
+    schema_editor.execute(
+        'ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s' % (
+            quote_name(Record._meta.db_table),
+            quote_name(CONSTRAINT_NAME),
+        )
+    )
+    schema_editor.execute(
+        "CREATE INDEX %s ON %s USING gist "
+        "(%s, tstzrange(%s, %s, '[)'))" % (
+            quote_name(RANGE_INDEX_NAME),
+            quote_name(Record._meta.db_table),
+            quote_name('thing_id'),
+            quote_name('start_at'),
+            quote_name('end_at'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_record_span_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_exclusion_constraint,
+            remove_exclusion_constraint,
+        ),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+CONSTRAINT_NAME = 'reservations_record_no_overlap'
+
+
+def _recreate_exclusion_constraint(schema_editor, Record, deferrable):
+    # NOTE:
+    # A non deferrable exclusion constraint is checked per row so shifting
+    # consecutive records by a single UPDATE fails even when the result is
+    # valid. A deferrable one is checked at the end of the statement.
+    # PostgreSQL cannot alter an exclusion constraint so it is re-created.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote_name = schema_editor.quote_name
+    schema_editor.execute(
+        'ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s' % (
+            quote_name(Record._meta.db_table),
+            quote_name(CONSTRAINT_NAME),
+        )
+    )
+    schema_editor.execute(
+        "ALTER TABLE %s ADD CONSTRAINT %s EXCLUDE USING gist "
+        "(%s WITH =, tstzrange(%s, %s, '[)') WITH &&)%s" % (
+            quote_name(Record._meta.db_table),
+            quote_name(CONSTRAINT_NAME),
+            quote_name('thing_id'),
+            quote_name('start_at'),
+            quote_name('end_at'),
+            ' DEFERRABLE INITIALLY IMMEDIATE' if deferrable else '',
+        )
+    )
+
+
+def make_deferrable(apps, schema_editor):
+    Record = apps.get_model('reservations', 'Record')
+    _recreate_exclusion_constraint(schema_editor, Record, True)
+
+
+def make_non_deferrable(apps, schema_editor):
+    Record = apps.get_model('reservations', 'Record')
+    _recreate_exclusion_constraint(schema_editor, Record, False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_record_no_overlap'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_deferrable, make_non_deferrable),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_record_no_overlap_deferrable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thing', models.BigIntegerField(verbose_name='Thing')),
+                ('record', models.BigIntegerField(verbose_name='Record')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Deleted at')),
+            ],
+            options={
+                'verbose_name': 'Record tombstone',
+                'verbose_name_plural': 'Record tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['thing', 'updated_at'], name='reservations_record_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recordtombstone',
+            index=models.Index(fields=['thing', 'deleted_at'], name='reservations_tombstone_idx'),
+        ),
+    ]
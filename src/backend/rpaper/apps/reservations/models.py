@@ -1,9 +1,28 @@
 import uuid
 import datetime
-from django.db import models
+from django.db import (
+    models,
+    router,
+    connections,
+    transaction,
+    IntegrityError,
+)
+from django.db.models import (
+    F,
+    Q,
+    Sum,
+    Count,
+    Exists,
+    OuterRef,
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+)
+from django.db.models.functions import Trunc
 from django.urls import reverse
+from django.dispatch import Signal
 from django.conf import settings
-from django.utils import formats
+from django.utils import formats, timezone
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
@@ -13,6 +32,26 @@ from rpaper.core.utils import validate_on_save
 from rpaper.core.fields.hashids import HashidsField
 
 
+# Sent by RecordManager methods which save records without 'post_save'
+records_saved = Signal(providing_args=['records', 'created'])
+
+
+class ThingQuerySet(models.QuerySet):
+    """A queryset class of Thing model"""
+
+    def available_between(self, since, until):
+        """Return things which have no record overlapping with the span"""
+        overlapped = Record.objects.filter(
+            thing=OuterRef('pk'),
+            start_at__gt=Record.get_start_at_bound(since),
+            start_at__lt=until,
+            end_at__gt=since,
+        )
+        return self.annotate(
+            is_reserved=Exists(overlapped),
+        ).filter(is_reserved=False)
+
+
 class Thing(models.Model):
     hashid = HashidsField(
         verbose_name=_('Hashids'),
@@ -43,6 +82,8 @@ class Thing(models.Model):
     created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Modified at"), auto_now=True)
 
+    objects = ThingQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Thing")
         verbose_name_plural = _("Things")
@@ -56,24 +97,246 @@ class Thing(models.Model):
         ))
 
 
-class RecordManager(models.Manager):
+class RecordQuerySet(models.QuerySet):
+    """A queryset class of Record model"""
+
+    OCCUPANCY_BUCKETS = {
+        'day': datetime.timedelta(days=1),
+        'hour': datetime.timedelta(hours=1),
+    }
+
+    def occupancy(self, bucket, since=None, until=None):
+        """Return a list of (bucket, records, duration) of the queryset
+
+        Records which fit in a bucket are aggregated by the DB. Only records
+        which cross a boundary of buckets, 'since' or 'until' are split into
+        buckets in Python, clipped to the window between 'since' and 'until'.
+        """
+        delta = self.OCCUPANCY_BUCKETS[bucket]
+        qs = self.order_by().annotate(
+            bucket=Trunc('start_at', bucket, output_field=DateTimeField()),
+        )
+        inside = Q(end_at__lte=F('bucket') + delta)
+        if since is not None:
+            inside &= Q(start_at__gte=since)
+        if until is not None:
+            inside &= Q(end_at__lte=until)
+        occupancy = {}
+        inner = qs.filter(inside).values('bucket').annotate(
+            records=Count('pk'),
+            duration=Sum(ExpressionWrapper(
+                F('end_at') - F('start_at'),
+                output_field=DurationField(),
+            )),
+        )
+        for row in inner:
+            occupancy[row['bucket']] = [row['records'], row['duration']]
+        crossing = qs.exclude(inside).values_list(
+            'bucket', 'start_at', 'end_at',
+        )
+        for lower, start_at, end_at in crossing:
+            start_at = start_at if since is None else max(start_at, since)
+            end_at = end_at if until is None else min(end_at, until)
+            while lower + delta <= start_at:
+                lower += delta
+            while lower < end_at:
+                upper = lower + delta
+                duration = min(end_at, upper) - max(start_at, lower)
+                entry = occupancy.setdefault(
+                    lower, [0, datetime.timedelta()],
+                )
+                entry[0] += 1
+                entry[1] += duration
+                lower = upper
+        return [
+            (lower, records, duration)
+            for lower, (records, duration) in sorted(occupancy.items())
+        ]
+
+    def free_slots(self, since, until, duration):
+        """Yield (start_at, end_at) of free time-spans longer than duration
+
+        Records are scanned once in the order of (start_at, end_at) so only
+        the end of the last busy time-span is kept in memory.
+        """
+        qs = self.filter(
+            start_at__gt=Record.get_start_at_bound(since),
+            start_at__lt=until,
+            end_at__gt=since,
+        ).order_by('start_at', 'end_at').values_list('start_at', 'end_at')
+        lower = since
+        for start_at, end_at in qs.iterator():
+            if start_at - lower >= duration:
+                yield lower, start_at
+            lower = max(lower, end_at)
+        if until - lower >= duration:
+            yield lower, until
+
+
+class RecordManager(models.Manager.from_queryset(RecordQuerySet)):
     """A management class of Record model"""
 
     def _may_collide_with(self, record):
         # There is no record which time span is greater than threshold
         return self.filter(
-            thing=record.thing,
+            thing_id=record.thing_id,
             start_at__gt=record.start_at - Record.TIMESPAN_THRESHOLD,
             end_at__lt=record.end_at + Record.TIMESPAN_THRESHOLD,
         )
 
     def collide_with(self, record):
         """Return records queryset which collide with a record"""
-        qs = self._may_collide_with(record)
-        record_ids = (
-            r.pk for r in qs if record.is_collided(r)
+        # NOTE:
+        # The threshold window of '_may_collide_with' is kept so that the
+        # range scan on 'start_at' is bounded on both sides while the
+        # overlap test itself is evaluated by the DB in the same query.
+        qs = self._may_collide_with(record).filter(
+            start_at__lt=record.end_at,
+            end_at__gt=record.start_at,
+        )
+        if record.pk is not None:
+            qs = qs.exclude(pk=record.pk)
+        return qs
+
+    def validate_many(self, records):
+        """Return a list of ValidationError (or None) for each record
+
+        Records should belong to a same thing. Overlaps among the records
+        are detected by sort-and-sweep and collisions with existing records
+        by a single range query, instead of queries per record.
+        """
+        errors = [None] * len(records)
+        for i, record in enumerate(records):
+            try:
+                record._validate_timespan()
+            except ValidationError as e:
+                errors[i] = e
+        order = sorted(
+            (i for i, e in enumerate(errors) if e is None),
+            key=lambda i: (records[i].start_at, records[i].end_at),
         )
-        return self.filter(pk__in=record_ids)
+        if not order:
+            return errors
+
+        last = None
+        for i in order:
+            record = records[i]
+            if last is not None and record.start_at < last.end_at:
+                errors[i] = record._collision_error(last)
+            else:
+                last = record
+
+        self._validate_many_with_existing(records, order, errors)
+        return errors
+
+    def _validate_many_with_existing(self, records, order, errors):
+        lower = records[order[0]].start_at
+        upper = max(records[i].end_at for i in order)
+        existing = self.filter(
+            thing_id=records[order[0]].thing_id,
+            start_at__gt=lower - Record.TIMESPAN_THRESHOLD,
+            start_at__lt=upper,
+            end_at__gt=lower,
+        ).order_by('start_at', 'end_at')
+        pks = [r.pk for r in records if r.pk is not None]
+        if pks:
+            existing = existing.exclude(pk__in=pks)
+        existing = list(existing.only('hashid', 'name', 'start_at', 'end_at'))
+        # Existing records never overlap each other so they are also
+        # sorted by 'end_at' and a single cursor is enough to sweep them.
+        j = 0
+        for i in order:
+            record = records[i]
+            while j < len(existing) and existing[j].end_at <= record.start_at:
+                j += 1
+            if j == len(existing):
+                break
+            elif errors[i] is None and existing[j].start_at < record.end_at:
+                errors[i] = record._collision_error(existing[j])
+
+    def bulk_create(self, objs, batch_size=None):
+        objs = super().bulk_create(objs, batch_size=batch_size)
+        # NOTE:
+        # Most backends except PostgreSQL do not return primary keys of
+        # inserted rows. Records of a thing never share 'start_at' so the
+        # primary keys are looked up by a range query per thing.
+        missing = {}
+        for obj in objs:
+            if obj.pk is None:
+                missing.setdefault(obj.thing_id, []).append(obj)
+        for thing_id, records in missing.items():
+            qs = self.filter(
+                thing_id=thing_id,
+                start_at__gte=min(r.start_at for r in records),
+                start_at__lte=max(r.start_at for r in records),
+            ).values_list('start_at', 'pk')
+            pks = dict(qs)
+            for record in records:
+                record.pk = pks.get(record.start_at)
+        # 'bulk_create' does not send 'post_save' signals
+        records_saved.send(sender=self.model, records=objs, created=True)
+        return objs
+
+    def shift_many(self, records, offset):
+        """Shift time-spans of records of a thing by 'offset' at once
+
+        The shifted records are validated by 'validate_many' and written by
+        a single UPDATE only when all of them are valid. It returns a list
+        of ValidationError (or None) like 'validate_many'.
+        """
+        errors = [self._shift_error(r, offset) for r in records]
+        if any(errors):
+            return errors
+        for record in records:
+            record.start_at += offset
+            record.end_at += offset
+        errors = self.validate_many(records)
+        if any(errors):
+            for record in records:
+                record.start_at -= offset
+                record.end_at -= offset
+            return errors
+        updated_at = timezone.now()
+        self.filter(pk__in=[r.pk for r in records]).update(
+            start_at=F('start_at') + offset,
+            end_at=F('end_at') + offset,
+            updated_at=updated_at,
+        )
+        for record in records:
+            record.updated_at = updated_at
+        # 'update' does not send 'post_save' signals
+        records_saved.send(sender=self.model, records=records, created=False)
+        return errors
+
+    def _shift_error(self, record, offset):
+        try:
+            record.start_at + offset
+            record.end_at + offset
+        except OverflowError:
+            return ValidationError(
+                _('The record could not be shifted out of the range of '
+                  'dates.'),
+                code='invalid',
+            )
+        return None
+
+    def lock_for_collision(self, record):
+        """Serialize collision checks of records on a same thing
+
+        PostgreSQL enforces the non-overlap by an exclusion constraint so no
+        lock is required. Other backends lock the thing row until the end of
+        the current transaction. Note that SQLite does not support row locks
+        but it serializes all writes on the database instead.
+        """
+        using = router.db_for_write(self.model, instance=record)
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            return
+        elif not connection.in_atomic_block:
+            return
+        list(Thing.objects.using(using).select_for_update().filter(
+            pk=record.thing_id,
+        ).values_list('pk', flat=True))
 
 
 @validate_on_save
@@ -82,6 +345,8 @@ class Record(models.Model):
     TIMESPAN_THRESHOLD = datetime.timedelta(
         hours=TIMESPAN_MAX_HOURS
     )
+    # An exclusion constraint which exists only on PostgreSQL
+    OVERLAP_CONSTRAINT_NAME = 'reservations_record_no_overlap'
 
     hashid = HashidsField(
         verbose_name=_("Hashid"),
@@ -134,6 +399,19 @@ class Record(models.Model):
             'end_at',
             'name',
         )
+        indexes = [
+            # Every hot path filters records of a thing by a time range and
+            # returns them in the default ordering.
+            models.Index(
+                fields=['thing', 'start_at', 'end_at'],
+                name='reservations_record_span_idx',
+            ),
+            # The delta sync looks up records of a thing updated recently
+            models.Index(
+                fields=['thing', 'updated_at'],
+                name='reservations_record_sync_idx',
+            ),
+        ]
 
     def __str__(self):
         return _(
@@ -143,6 +421,30 @@ class Record(models.Model):
             name=self.name,
         )
 
+    @classmethod
+    def get_start_at_bound(cls, since):
+        """Return a lower bound of 'start_at' of records ending after 'since'
+
+        No record is longer than TIMESPAN_THRESHOLD so a range scan on
+        'start_at' starting from the bound finds all of them.
+        """
+        try:
+            return since - cls.TIMESPAN_THRESHOLD
+        except OverflowError:
+            return datetime.datetime.min.replace(tzinfo=timezone.utc)
+
+    def save(self, *args, **kwargs):
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                return super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if type(self).OVERLAP_CONSTRAINT_NAME not in str(e):
+                raise
+            # A concurrent request has saved a collided record after the
+            # validation. Report it as same as the validation does.
+            self._validate_collision()
+            raise
+
     def is_collided(self, other):
         """Return if the record is collided with other"""
         if self.end_at <= other.start_at or other.end_at <= self.start_at:
@@ -183,10 +485,69 @@ class Record(models.Model):
             )
 
     def _validate_collision(self):
-        qs = Record.objects.collide_with(self)
-        if qs.count() > 0:
-            raise ValidationError(
-                _("The record collide with %(record)s"),
-                code='invalid',
-                params={'record': qs.first()},
-            )
+        Record.objects.lock_for_collision(self)
+        collided = Record.objects.collide_with(self).first()
+        if collided is not None:
+            raise self._collision_error(collided)
+
+    def _collision_error(self, other):
+        return ValidationError(
+            _("The record collide with %(record)s"),
+            code='invalid',
+            params={'record': other},
+        )
+
+
+class RecordTombstoneQuerySet(models.QuerySet):
+    """A queryset class of RecordTombstone model"""
+
+    def of_thing(self, thing_pk):
+        return self.filter(thing=Thing._meta.pk.get_prep_value(thing_pk))
+
+    def log(self, tombstones):
+        """Insert tombstones and prune expired ones of their things"""
+        self.bulk_create(tombstones)
+        expired_at = timezone.now() - RecordTombstone.RETENTION
+        return self.filter(
+            thing__in=set(t.thing for t in tombstones),
+            deleted_at__lt=expired_at,
+        ).delete()
+
+
+class RecordTombstone(models.Model):
+    """A deletion log of records which is used by the delta sync
+
+    Primary keys are stored as plain integers since tombstones outlive the
+    records and are removed together with the thing by a signal.
+    """
+    # Clients which have not synced longer than this should reload
+    RETENTION = datetime.timedelta(days=30)
+
+    thing = models.BigIntegerField(_("Thing"))
+    record = models.BigIntegerField(_("Record"))
+    deleted_at = models.DateTimeField(_("Deleted at"), auto_now_add=True)
+
+    objects = RecordTombstoneQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Record tombstone")
+        verbose_name_plural = _("Record tombstones")
+        indexes = [
+            models.Index(
+                fields=['thing', 'deleted_at'],
+                name='reservations_tombstone_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.get_record_display()
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(
+            thing=Thing._meta.pk.get_prep_value(record.thing_id),
+            record=Record._meta.pk.get_prep_value(record.pk),
+        )
+
+    def get_record_display(self):
+        return Record._meta.pk.encode_hashids(self.record)
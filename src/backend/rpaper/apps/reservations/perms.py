@@ -1,5 +1,7 @@
+import hmac
+from django.db.models import Q
 from permission.logics import PermissionLogic
-from .middleware import get_record_credential
+from .middleware import get_record_credentials
 
 
 class ThingPermissionLogic(PermissionLogic):
@@ -12,7 +14,8 @@ class ThingPermissionLogic(PermissionLogic):
             return False
         elif obj is None:
             return user_obj.is_authenticated()
-        return obj.owner == user_obj
+        # Compare ids to prevent the owner from being fetched
+        return obj.owner_id == user_obj.pk
 
 
 class RecordPermissionLogic(PermissionLogic):
@@ -27,7 +30,7 @@ class RecordPermissionLogic(PermissionLogic):
             return True
         elif obj is None:
             return True
-        if obj.owner:
+        if obj.owner_id is not None:
             # NOTE:
             # DO NOT FALLBACK TO 'CREDENTIAL' WAY.
             # As I explained below, the 'credential' way has a security risk.
@@ -37,7 +40,7 @@ class RecordPermissionLogic(PermissionLogic):
             # In this case, if the user logged out, even users who share the
             # same web-browser cannot touch the record unless he/she have
             # a way to logged in as that user.
-            return obj.owner == user_obj
+            return obj.owner_id == user_obj.pk
         # NOTE:
         # The 'credential' way is not secure.
         # While the 'credential' is assumed to saved in a localStorage, users
@@ -48,8 +51,33 @@ class RecordPermissionLogic(PermissionLogic):
         # the record and the advantage he/she can get is not so valuable.
         # So that I just decided to ignore this security risk for an anonyomous
         # user.
-        credential = get_record_credential()
-        return credential and str(obj.credential) == credential
+        # Compare with all credentials in constant time so the response
+        # time does not tell which part of a credential is correct.
+        credential = str(obj.credential)
+        matched = False
+        for candidate in get_record_credentials():
+            matched |= hmac.compare_digest(credential, candidate)
+        return matched
+
+
+def get_modifiable_records_filter(user_obj):
+    """Return a Q object of records which the user can change or delete
+
+    It is a set-based counterpart of RecordPermissionLogic so permissions
+    of many records are evaluated by a single query.
+    """
+    conditions = []
+    if user_obj.is_authenticated():
+        conditions.append(Q(owner_id=user_obj.pk))
+    credentials = get_record_credentials()
+    if credentials:
+        conditions.append(Q(owner__isnull=True, credential__in=credentials))
+    if not conditions:
+        return Q(pk__in=[])
+    q = conditions[0]
+    for condition in conditions[1:]:
+        q |= condition
+    return q
 
 
 PERMISSION_LOGICS = (
@@ -0,0 +1,46 @@
+from functools import partial
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from ws4redis.publisher import RedisPublisher
+from ws4redis.redis_store import RedisMessage
+
+RECORD_FACILITY = 'reservations-%s'
+
+RECORD_CREATED = 'created'
+RECORD_UPDATED = 'updated'
+RECORD_DELETED = 'deleted'
+
+
+def get_record_facility(thing_pk):
+    """Return a ws4redis facility where changes of records are published"""
+    return RECORD_FACILITY % thing_pk
+
+
+def build_record_change(action, record):
+    """Return a JSON message which describes a change of a record"""
+    from .api.serializer import RecordSerializer
+    if action == RECORD_DELETED:
+        data = dict(thing=record.thing_id, pk=record.pk)
+    else:
+        data = RecordSerializer(record).data
+    return JSONRenderer().render(dict(action=action, record=data))
+
+
+def publish_record_change(thing_pk, message):
+    """Broadcast a message to clients which subscribe records of a thing"""
+    publisher = RedisPublisher(
+        facility=get_record_facility(thing_pk),
+        broadcast=True,
+    )
+    publisher.publish_message(RedisMessage(message))
+
+
+def publish_record_change_on_commit(action, record):
+    """Publish a change of a record when the current transaction commits"""
+    # NOTE:
+    # The message is built immediately while the record still has its pk
+    # but published only when the change has committed.
+    message = build_record_change(action, record)
+    transaction.on_commit(partial(
+        publish_record_change, record.thing_id, message,
+    ))
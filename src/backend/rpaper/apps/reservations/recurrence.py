@@ -0,0 +1,52 @@
+import datetime
+from django.utils import timezone
+
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+
+FREQUENCIES = {
+    DAILY: datetime.timedelta(days=1),
+    WEEKLY: datetime.timedelta(weeks=1),
+}
+
+# The maximum number of occurrences expanded from a recurrence rule
+MAX_OCCURRENCES = 366
+
+# The maximum number of days or weeks between occurrences
+MAX_INTERVAL = 366
+
+
+class TooManyOccurrences(ValueError):
+    """Raised when a recurrence rule has more than MAX_OCCURRENCES"""
+
+
+def expand_recurrence(start_at, end_at, frequency, interval=1,
+                      count=None, until=None):
+    """Yield (start_at, end_at) of each occurrence of a recurrence rule
+
+    Occurrences are repeated on the wall clock of the current time zone so
+    a weekly slot keeps its local time across DST transitions. The
+    expansion stops at 'count' occurrences or at the last occurrence which
+    starts before or at 'until', whichever comes first. TooManyOccurrences
+    is raised instead of truncating a rule which has more than
+    MAX_OCCURRENCES and OverflowError when an occurrence is out of the
+    range of datetime.
+    """
+    if count is not None and count > MAX_OCCURRENCES:
+        raise TooManyOccurrences(count)
+    step = FREQUENCIES[frequency] * interval
+    duration = end_at - start_at
+    local = timezone.localtime(start_at)
+    tzinfo = timezone.get_current_timezone()
+    origin = local.replace(tzinfo=None)
+    # One more occurrence is examined to tell whether 'until' is too far
+    limit = MAX_OCCURRENCES + 1 if count is None else count
+    for i in range(limit):
+        lower = origin + step * i
+        lower = timezone.make_aware(lower, tzinfo, is_dst=False)
+        if until is not None and lower > until:
+            return
+        elif i == MAX_OCCURRENCES:
+            raise TooManyOccurrences(i + 1)
+        yield lower, lower + duration
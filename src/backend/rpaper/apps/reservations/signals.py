@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from rpaper.core.utils import ContextVar
+from .cache import bump_thing_version_on_commit
+from .models import (
+    Thing,
+    Record,
+    RecordTombstone,
+    records_saved,
+)
+from .publishers import (
+    RECORD_CREATED,
+    RECORD_UPDATED,
+    RECORD_DELETED,
+    publish_record_change_on_commit,
+)
+
+
+_deferred_tombstones = ContextVar(
+    'reservations_deferred_tombstones',
+    default=None,
+)
+
+
+@contextmanager
+def defer_record_tombstones():
+    """Write tombstones of records deleted in the block at once
+
+    Tombstones are inserted and expired ones are pruned by a query each when
+    the block exits without an exception.
+    """
+    tombstones = []
+    token = _deferred_tombstones.set(tombstones)
+    try:
+        yield
+    finally:
+        _deferred_tombstones.reset(token)
+    if tombstones:
+        RecordTombstone.objects.log(tombstones)
+
+
+@receiver(post_save, sender=Thing)
+@receiver(post_delete, sender=Thing)
+def invalidate_thing_cache(sender, instance, **kwargs):
+    bump_thing_version_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Record)
+@receiver(post_delete, sender=Record)
+def invalidate_record_cache(sender, instance, **kwargs):
+    bump_thing_version_on_commit(instance.thing_id)
+
+
+@receiver(records_saved, sender=Record)
+def invalidate_records_cache(sender, records, **kwargs):
+    for thing_pk in set(r.thing_id for r in records):
+        bump_thing_version_on_commit(thing_pk)
+
+
+@receiver(post_save, sender=Record)
+def publish_record_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    action = RECORD_CREATED if created else RECORD_UPDATED
+    publish_record_change_on_commit(action, instance)
+
+
+@receiver(records_saved, sender=Record)
+def publish_records_saved(sender, records, created, **kwargs):
+    action = RECORD_CREATED if created else RECORD_UPDATED
+    for record in records:
+        publish_record_change_on_commit(action, record)
+
+
+@receiver(post_delete, sender=Record)
+def publish_record_deleted(sender, instance, **kwargs):
+    publish_record_change_on_commit(RECORD_DELETED, instance)
+
+
+@receiver(post_delete, sender=Record)
+def log_record_deleted(sender, instance, **kwargs):
+    tombstone = RecordTombstone.from_record(instance)
+    deferred = _deferred_tombstones.get()
+    if deferred is not None:
+        deferred.append(tombstone)
+    else:
+        RecordTombstone.objects.log([tombstone])
+
+
+@receiver(post_delete, sender=Thing)
+def clear_record_tombstones(sender, instance, **kwargs):
+    # Records are deleted before the thing so their tombstones exist here
+    RecordTombstone.objects.of_thing(instance.pk).delete()
@@ -0,0 +1,44 @@
+import json
+import datetime
+from pytz import UTC
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from .factories import ThingFactory, RecordFactory
+from ..models import Record
+from ..api.serializer import (
+    RecordSerializer,
+    RecordValuesSerializer,
+    format_datetime,
+)
+
+
+class RecordValuesSerializerTestCase(TestCase):
+    def setUp(self):
+        self.thing = ThingFactory()
+        anchor = datetime.datetime(2014, 1, 1, 10, 0, 0, 123, tzinfo=UTC)
+        for i in range(5):
+            RecordFactory(
+                thing=self.thing,
+                remarks='' if i % 2 else 'Remarks %d' % i,
+                start_at=anchor + datetime.timedelta(hours=i * 2),
+                end_at=anchor + datetime.timedelta(hours=i * 2 + 1),
+            )
+
+    def test_same_data_as_record_serializer(self):
+        queryset = Record.objects.filter(thing=self.thing)
+        expected = RecordSerializer(queryset, many=True).data
+        with self.assertNumQueries(1):
+            data = RecordValuesSerializer(
+                RecordValuesSerializer.get_values(queryset)
+            ).data
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(data), renderer.render(expected))
+        self.assertEqual(list(json.loads(renderer.render(data))[0].keys()), [
+            'thing', 'pk', 'name', 'contact', 'remarks',
+            'start_at', 'end_at',
+        ])
+
+    def test_format_datetime(self):
+        value = datetime.datetime(2014, 1, 1, 10, 0, 0, tzinfo=UTC)
+        self.assertEqual(format_datetime(value), '2014-01-01T10:00:00Z')
+        self.assertEqual(format_datetime(None), None)
@@ -1,11 +1,20 @@
+import json
 import datetime
 from operator import itemgetter, attrgetter
+from unittest.mock import patch
 from pytz import UTC
+from django.db import IntegrityError, connection
+from django.core.cache import cache
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.urlresolvers import reverse
 from rest_framework.test import APIClient
 from rpaper.core.storage.dummy import create_dummy_image
-from ..models import Thing, Record
+from ..api import views
+from ..api.serializer import RecordListSerializer
+from ..models import Thing, Record, RecordQuerySet, RecordTombstone
+from ..cache import VERSION_KEY, MODIFIED_KEY, VERSION_TIMEOUT
+from ..recurrence import MAX_INTERVAL
 from .factories import (
     UserFactory,
     ThingFactory,
@@ -13,10 +22,32 @@ from .factories import (
 )
 
 
+class APIViewTestCase(TestCase):
+    """A test case which runs 'on_commit' callbacks immediately
+
+    TestCase never commits so callbacks which invalidate cached responses
+    would never run otherwise.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.on_commit = patch(
+            'django.db.transaction.on_commit',
+            side_effect=lambda f: f(),
+        )
+        cls.on_commit.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.on_commit.stop()
+        super().tearDownClass()
+
+
 @override_settings(
     DEFAULT_FILE_STORAGE='rpaper.core.storage.dummy.DummyStorage',
 )
-class ThingAPIView(TestCase):
+class ThingAPIView(APIViewTestCase):
     LIST_URL_NAME = 'reservations-api:things-list'
     DETAIL_URL_NAME = 'reservations-api:things-detail'
 
@@ -39,6 +70,33 @@ class ThingAPIView(TestCase):
         ])
         self.assertEqual(response.data['pk'], thing.pk)
 
+    def test_detail_queries(self):
+        thing = ThingFactory()
+        url = reverse(self.DETAIL_URL_NAME, kwargs=dict(pk=thing.pk))
+        # The owner is joined and unused columns are deferred
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('ipaddress', context.captured_queries[0]['sql'])
+        self.assertEqual(response.data['owner'], dict(
+            username=thing.owner.username,
+            email=thing.owner.email,
+        ))
+
+    def test_detail_cached(self):
+        thing = ThingFactory()
+        url = reverse(self.DETAIL_URL_NAME, kwargs=dict(pk=thing.pk))
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], thing.name)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['name'], thing.name)
+
+        thing.name = 'A renamed thing'
+        thing.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'A renamed thing')
+
     def test_create_valid(self):
         self.client.force_authenticate(user=self.user)
         url = reverse(self.LIST_URL_NAME)
@@ -141,7 +199,7 @@ class ThingAPIView(TestCase):
         self.assertEqual(Thing.objects.count(), n_previous)
 
 
-class RecordAPIView(TestCase):
+class RecordAPIView(APIViewTestCase):
     LIST_URL_NAME = 'reservations-api:records-list'
     DETAIL_URL_NAME = 'reservations-api:records-detail'
 
@@ -204,6 +262,18 @@ class RecordAPIView(TestCase):
         # end_at >= anchor : anchor + 49
         self.assertEqual(len(response.data), 50)
 
+        # The range scan on 'start_at' is bounded by 'since'
+        since = anchor + datetime.timedelta(hours=30)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, dict(since=since.isoformat()))
+        self.assertEqual(len(response.data), 20)
+        self.assertIn('"start_at" >', context.captured_queries[-1]['sql'])
+        response = self.client.get(url, dict(
+            since='0001-01-01T00:00:00Z',
+        ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data), 97)
+
     def test_list_filter_until(self):
         anchor = datetime.datetime(2014, 1, 1, 12, 0, 0, tzinfo=UTC)
         d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
@@ -268,6 +338,146 @@ class RecordAPIView(TestCase):
         #
         self.assertEqual(len(response.data), 12)
 
+    def test_list_cached(self):
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        RecordFactory(thing=self.thing)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+
+        # The time-span is pinned so it never collides with the first one
+        record = RecordFactory(
+            thing=self.thing,
+            start_at=datetime.datetime(2009, 1, 1, 0, tzinfo=UTC),
+            end_at=datetime.datetime(2009, 1, 1, 1, tzinfo=UTC),
+        )
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 2)
+
+        record.delete()
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+
+    def test_list_without_thing_lookup(self):
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        RecordFactory(thing=self.thing)
+        # Only records are fetched when the result is not empty
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+
+    def test_list_queries(self):
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        for i in range(1, 11):
+            RecordFactory(
+                thing=self.thing,
+                owner=UserFactory(),
+                start_at=datetime.datetime(2009, 1, i, 0, tzinfo=UTC),
+                end_at=datetime.datetime(2009, 1, i, 1, tzinfo=UTC),
+            )
+        # Columns which RecordSerializer does not return are never loaded
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('credential', context.captured_queries[0]['sql'])
+
+    def test_list_not_found(self):
+        thing = ThingFactory()
+        thing_pk = thing.pk
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=thing_pk,
+        ))
+        thing.delete()
+        keys = (VERSION_KEY % thing_pk, MODIFIED_KEY % thing_pk)
+        cache.delete_many(keys)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        # Versions of unknown things never stay in the cache forever
+        for key in keys:
+            ttl = cache.ttl(key)
+            self.assertIsNotNone(ttl)
+            self.assertGreater(ttl, 0)
+            self.assertLessEqual(ttl, VERSION_TIMEOUT)
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk='invalid',
+        ))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_conditional(self):
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        record = RecordFactory(thing=self.thing)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, dict(
+            since='2014-01-01T00:00:00Z',
+        ), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        record.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 0)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_paginated(self):
+        anchor = datetime.datetime(2014, 1, 1, 12, 0, 0, tzinfo=UTC)
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        records = [
+            RecordFactory(
+                thing=self.thing,
+                start_at=anchor+d(i),
+                end_at=anchor+d(i+1),
+            )
+            for i in range(10)
+        ]
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        response = self.client.get(url, dict(page_size=4))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(list(response.data.keys()), ['next', 'results'])
+        self.assertEqual(
+            list(map(itemgetter('pk'), response.data['results'])),
+            list(map(attrgetter('pk'), records[:4])),
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            list(map(itemgetter('pk'), response.data['results'])),
+            list(map(attrgetter('pk'), records[4:8])),
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            list(map(itemgetter('pk'), response.data['results'])),
+            list(map(attrgetter('pk'), records[8:])),
+        )
+        self.assertEqual(response.data['next'], None)
+
+    def test_list_paginated_invalid_cursor(self):
+        url = reverse(self.LIST_URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        response = self.client.get(url, dict(cursor='invalid'))
+        self.assertEqual(response.status_code, 404, response.data)
+
     def test_detail(self):
         record = RecordFactory(thing=self.thing)
         url = reverse(self.DETAIL_URL_NAME, kwargs=dict(
@@ -581,3 +791,947 @@ class RecordAPIView(TestCase):
         ))
         response = self.client.delete(url)
         self.assertEqual(response.status_code, 403, response.data)
+
+
+class RecordOccupancyAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-occupancy'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 10, 0, 0, tzinfo=UTC)
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        r = lambda s, e: RecordFactory(  # noqa: E731
+            thing=self.thing,
+            start_at=self.anchor+d(s),
+            end_at=self.anchor+d(e),
+        )
+        r(0, 2)
+        r(3, 4)
+        r(13, 15)
+        r(37, 60)
+        RecordFactory(start_at=self.anchor, end_at=self.anchor+d(1))
+
+    def test_day(self):
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(o['bucket'], o['records'], o['minutes']) for o in response.data],
+            [
+                ('2014-01-01T00:00:00Z', 3, 4 * 60),
+                ('2014-01-02T00:00:00Z', 2, 2 * 60),
+                ('2014-01-03T00:00:00Z', 1, 22 * 60),
+            ],
+        )
+
+    def test_hour(self):
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        response = self.client.get(url, dict(
+            bucket='hour',
+            until=(self.anchor + datetime.timedelta(hours=5)).isoformat(),
+        ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(o['bucket'], o['records'], o['minutes']) for o in response.data],
+            [
+                ('2014-01-01T10:00:00Z', 1, 60),
+                ('2014-01-01T11:00:00Z', 1, 60),
+                ('2014-01-01T13:00:00Z', 1, 60),
+            ],
+        )
+
+    def test_window(self):
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        # Records crossing 'since' or 'until' are clipped to the window
+        response = self.client.get(url, dict(
+            bucket='hour',
+            since=(self.anchor + d(1.5)).isoformat(),
+            until=(self.anchor + d(38.5)).isoformat(),
+        ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(o['bucket'], o['records'], o['minutes']) for o in response.data],
+            [
+                ('2014-01-01T11:00:00Z', 1, 30),
+                ('2014-01-01T13:00:00Z', 1, 60),
+                ('2014-01-01T23:00:00Z', 1, 60),
+                ('2014-01-02T00:00:00Z', 1, 60),
+                ('2014-01-02T23:00:00Z', 1, 60),
+                ('2014-01-03T00:00:00Z', 1, 30),
+            ],
+        )
+
+    def test_invalid_bucket(self):
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        response = self.client.get(url, dict(bucket='week'))
+        self.assertEqual(response.status_code, 400, response.data)
+
+
+class RecordAvailabilityAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-availability'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        r = lambda s, e: RecordFactory(  # noqa: E731
+            thing=self.thing,
+            start_at=self.anchor+d(s),
+            end_at=self.anchor+d(e),
+        )
+        r(1, 3)
+        r(4, 5)
+        r(5, 6)
+        r(8, 9)
+        RecordFactory(start_at=self.anchor, end_at=self.anchor+d(12))
+
+    def test_list(self):
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, dict(
+                since=(self.anchor + d(2)).isoformat(),
+                until=(self.anchor + d(12)).isoformat(),
+                duration='01:30:00',
+            ))
+        self.assertEqual(response.status_code, 200, response.data)
+        # The range scan on 'start_at' is bounded on both sides
+        sql = context.captured_queries[-1]['sql']
+        self.assertIn('"start_at" >', sql)
+        self.assertIn('"start_at" <', sql)
+        self.assertEqual(
+            [(o['start_at'], o['end_at']) for o in response.data],
+            [
+                ('2014-01-01T06:00:00Z', '2014-01-01T08:00:00Z'),
+                ('2014-01-01T09:00:00Z', '2014-01-01T12:00:00Z'),
+            ],
+        )
+
+    def test_list_invalid(self):
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk=self.thing.pk))
+        response = self.client.get(url, dict(
+            since=self.anchor.isoformat(),
+            until=self.anchor.isoformat(),
+            duration='01:00:00',
+        ))
+        self.assertEqual(response.status_code, 400, response.data)
+        response = self.client.get(url, dict(
+            since=self.anchor.isoformat(),
+        ))
+        self.assertEqual(response.status_code, 400, response.data)
+
+
+class ThingAvailabilityAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:things-availability'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.anchor = datetime.datetime(2014, 1, 1, 10, 0, 0, tzinfo=UTC)
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        self.things = [ThingFactory() for i in range(4)]
+        RecordFactory(
+            thing=self.things[0],
+            start_at=self.anchor+d(1),
+            end_at=self.anchor+d(3),
+        )
+        RecordFactory(
+            thing=self.things[1],
+            start_at=self.anchor-d(1),
+            end_at=self.anchor,
+        )
+        RecordFactory(
+            thing=self.things[2],
+            start_at=self.anchor-d(1),
+            end_at=self.anchor+d(1),
+        )
+
+    def test_list(self):
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        url = reverse(self.URL_NAME)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, dict(
+                since=self.anchor.isoformat(),
+                until=(self.anchor + d(2)).isoformat(),
+            ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(context.captured_queries), 1)
+        # The probe of each thing is bounded on both sides of 'start_at'
+        sql = context.captured_queries[0]['sql']
+        self.assertIn('"start_at" >', sql)
+        self.assertIn('"start_at" <', sql)
+        self.assertEqual(
+            sorted(map(itemgetter('pk'), response.data)),
+            sorted(map(attrgetter('pk'), self.things[1::2])),
+        )
+
+    def test_list_things(self):
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        url = reverse(self.URL_NAME)
+        response = self.client.get(url, dict(
+            since=self.anchor.isoformat(),
+            until=(self.anchor + d(2)).isoformat(),
+            things=','.join(t.pk for t in self.things[:2]),
+        ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            list(map(itemgetter('pk'), response.data)),
+            [self.things[1].pk],
+        )
+
+    def test_list_invalid(self):
+        url = reverse(self.URL_NAME)
+        response = self.client.get(url, dict(
+            since=self.anchor.isoformat(),
+            until=self.anchor.isoformat(),
+        ))
+        self.assertEqual(response.status_code, 400, response.data)
+        response = self.client.get(url, dict(
+            since=self.anchor.isoformat(),
+            until=(self.anchor + datetime.timedelta(hours=1)).isoformat(),
+            things='invalid',
+        ))
+        self.assertEqual(response.status_code, 400, response.data)
+
+
+class RecordBulkCreateAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-bulk'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        RecordFactory(
+            thing=self.thing,
+            start_at=self.anchor+datetime.timedelta(hours=10),
+            end_at=self.anchor+datetime.timedelta(hours=12),
+        )
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+
+    def build(self, s, e):
+        d = lambda x: datetime.timedelta(hours=x)  # noqa: E731
+        return dict(
+            name='This is a test record',
+            contact='Call my name with your loudest voice',
+            start_at=(self.anchor + d(s)).isoformat(),
+            end_at=(self.anchor + d(e)).isoformat(),
+        )
+
+    def test_create_valid(self):
+        n_record = Record.objects.count()
+        data = [self.build(i * 24, i * 24 + 2) for i in range(1, 50)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 49)
+        self.assertEqual(list(response.data[0].keys()), [
+            'thing', 'pk', 'name', 'contact', 'remarks',
+            'start_at', 'end_at', 'credential',
+        ])
+        self.assertEqual(Record.objects.count(), n_record + 49)
+        inserts = [
+            q for q in context.captured_queries
+            if q['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(len(inserts), 1)
+        record = Record.objects.get(pk=response.data[0]['pk'])
+        self.assertEqual(record.start_at.isoformat(), data[0]['start_at'])
+        self.assertEqual(str(record.credential), response.data[0]['credential'])
+
+    def test_create_invalid(self):
+        n_record = Record.objects.count()
+        response = self.client.post(self.url, [
+            self.build(0, 2),
+            self.build(1, 3),
+            self.build(11, 13),
+            self.build(5, 4),
+            self.build(20, 22),
+        ], format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual([bool(e) for e in response.data], [
+            False, True, True, True, False,
+        ])
+        self.assertEqual(Record.objects.count(), n_record)
+
+        data = self.build(0, 2)
+        del data['name']
+        response = self.client.post(self.url, [data], format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn('name', response.data[0])
+
+    def test_create_too_many(self):
+        n_record = Record.objects.count()
+        max_records = RecordListSerializer.MAX_RECORDS
+        data = [self.build(i * 24, i * 24 + 2) for i in range(max_records)]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Record.objects.count(), n_record + max_records)
+
+        data = [
+            self.build(i * 24, i * 24 + 2)
+            for i in range(max_records, max_records * 2 + 1)
+        ]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn('non_field_errors', response.data)
+        self.assertEqual(Record.objects.count(), n_record + max_records)
+
+    def test_create_overlap_constraint_violation(self):
+        n_record = Record.objects.count()
+        data = [self.build(0, 2), self.build(10, 12)]
+        # NOTE:
+        # Emulate a concurrent request which has saved a collided record
+        # between the validation and the insertion.
+        error = IntegrityError(
+            'conflicting key value violates exclusion constraint "%s"' % (
+                Record.OVERLAP_CONSTRAINT_NAME,
+            )
+        )
+        validate_many = Record.objects.validate_many
+        validated = []
+
+        def validate_late(records):
+            # The collision is not visible on the first validation
+            validated.append(records)
+            if len(validated) == 1:
+                return [None] * len(records)
+            return validate_many(records)
+
+        with patch.object(Record.objects, 'bulk_create', side_effect=error), \
+                patch.object(Record.objects, 'validate_many',
+                             side_effect=validate_late):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual([bool(e) for e in response.data], [False, True])
+
+        # The error is raised when the collided record has gone
+        with patch.object(Record.objects, 'bulk_create', side_effect=error):
+            self.assertRaises(
+                IntegrityError,
+                self.client.post, self.url, [self.build(0, 2)],
+                format='json',
+            )
+        self.assertEqual(Record.objects.count(), n_record)
+
+
+class RecordRecurringCreateAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-recurring'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 9, 0, 0, tzinfo=UTC)
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        self.data = dict(
+            name='Weekly lab meeting',
+            contact='Call my name with your loudest voice',
+            start_at=self.anchor.isoformat(),
+            end_at=(self.anchor + datetime.timedelta(hours=2)).isoformat(),
+            frequency='weekly',
+        )
+
+    def test_create_with_count(self):
+        data = dict(self.data, count=52)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 52)
+        self.assertNotIn('frequency', response.data[0])
+        self.assertEqual(
+            Record.objects.filter(thing=self.thing).count(), 52,
+        )
+        self.assertLess(len(context.captured_queries), 15)
+
+    def test_create_with_until(self):
+        until = self.anchor + datetime.timedelta(weeks=3)
+        data = dict(self.data, interval=2, until=until.isoformat())
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 2)
+
+    def test_create_collided(self):
+        RecordFactory(
+            thing=self.thing,
+            start_at=self.anchor + datetime.timedelta(weeks=2, hours=1),
+            end_at=self.anchor + datetime.timedelta(weeks=2, hours=3),
+        )
+        data = dict(self.data, count=4)
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual([bool(e) for e in response.data], [
+            False, False, True, False,
+        ])
+        self.assertEqual(
+            Record.objects.filter(thing=self.thing).count(), 1,
+        )
+
+    def test_create_invalid_rule(self):
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        data = dict(self.data, frequency='yearly', count=2)
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn('frequency', response.data)
+        data = dict(self.data, interval=10 ** 9, count=2)
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn('interval', response.data)
+        until = self.anchor + datetime.timedelta(days=800)
+        data = dict(self.data, frequency='daily', until=until.isoformat())
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(
+            Record.objects.filter(thing=self.thing).count(), 0,
+        )
+        start_at = datetime.datetime(9999, 1, 1, 9, 0, 0, tzinfo=UTC)
+        data = dict(
+            self.data,
+            start_at=start_at.isoformat(),
+            end_at=(start_at + datetime.timedelta(hours=2)).isoformat(),
+            interval=MAX_INTERVAL,
+            count=2,
+        )
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+
+
+class RecordBulkUpdateAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-list'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserFactory()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 9, 0, 0, tzinfo=UTC)
+        self.records = [
+            RecordFactory(
+                thing=self.thing,
+                owner=self.user,
+                start_at=self.anchor + datetime.timedelta(days=i),
+                end_at=self.anchor + datetime.timedelta(days=i, hours=2),
+            )
+            for i in range(7)
+        ]
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        self.window = '?since=%s&until=%s' % (
+            '2014-01-03T00:00:00Z',
+            '2014-01-05T23:59:59Z',
+        )
+
+    def test_delete(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Record.objects.filter(thing=self.thing)),
+            self.records[:2] + self.records[5:],
+        )
+        # Tombstones are inserted and pruned once
+        self.assertEqual(
+            sorted(t.get_record_display() for t in
+                   RecordTombstone.objects.of_thing(self.thing.pk)),
+            sorted(r.pk for r in self.records[2:5]),
+        )
+        statements = [
+            q['sql'].split()[0] for q in context.captured_queries
+            if 'tombstone' in q['sql']
+        ]
+        self.assertEqual(statements, ['INSERT', 'DELETE'])
+
+    def test_delete_requires_window(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Record.objects.filter(thing=self.thing).count(), 7)
+
+    def test_delete_forbidden(self):
+        record = self.records[3]
+        record.owner = None
+        record.save()
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Record.objects.filter(thing=self.thing).count(), 7)
+
+        # A record without an owner is modifiable with the credential
+        self.client.credentials(**{
+            'X-RESERVATIONS-RECORD-CREDENTIAL': str(record.credential),
+        })
+        response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Record.objects.filter(thing=self.thing).count(), 4)
+
+    def test_delete_with_credentials(self):
+        records = self.records[2:5]
+        Record.objects.filter(pk__in=[r.pk for r in records]).update(
+            owner=None,
+        )
+        self.client.force_authenticate(None)
+        self.client.credentials(**{
+            'X-RESERVATIONS-RECORD-CREDENTIAL': ','.join(
+                str(r.credential) for r in records[:2]
+            ),
+        })
+        response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 403)
+
+        self.client.credentials(**{
+            'X-RESERVATIONS-RECORD-CREDENTIAL': ','.join(
+                str(r.credential) for r in records
+            ),
+        })
+        response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Record.objects.filter(thing=self.thing).count(), 4)
+
+    def test_delete_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Record.objects.filter(thing=self.thing).count(), 7)
+
+    def reassign_after_check(self, record):
+        check_window_permissions = \
+            views.RecordBulkUpdateMixin.check_window_permissions
+
+        def check_and_reassign(view, queryset):
+            queryset = check_window_permissions(view, queryset)
+            # Emulate a concurrent request which has reassigned the record
+            # after the permission check
+            Record.objects.filter(pk=record.pk).update(owner=None)
+            return queryset
+
+        return patch.object(
+            views.RecordBulkUpdateMixin,
+            'check_window_permissions',
+            check_and_reassign,
+        )
+
+    def test_delete_reassigned_concurrently(self):
+        record = self.records[3]
+        self.client.force_authenticate(self.user)
+        with self.reassign_after_check(record):
+            response = self.client.delete(self.url + self.window)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            list(Record.objects.filter(thing=self.thing)),
+            self.records[:2] + [record] + self.records[5:],
+        )
+
+    def test_shift(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(
+            self.url + self.window,
+            dict(offset='3 00:00:00'),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual([bool(e) for e in response.data], [
+            True, True, False,
+        ])
+
+        # Shift into the free days after the last record
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url + self.window,
+                dict(offset='5 00:00:00'),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [r['pk'] for r in response.data],
+            [r.pk for r in self.records[2:5]],
+        )
+        updates = [
+            q for q in context.captured_queries
+            if q['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 1)
+        record = Record.objects.get(pk=self.records[2].pk)
+        self.assertEqual(
+            record.start_at,
+            self.records[2].start_at + datetime.timedelta(days=5),
+        )
+
+    def test_shift_overlap_constraint_violation(self):
+        self.client.force_authenticate(self.user)
+        # NOTE:
+        # Emulate a concurrent request which has saved a collided record
+        # between the validation and the update.
+        error = IntegrityError(
+            'conflicting key value violates exclusion constraint "%s"' % (
+                Record.OVERLAP_CONSTRAINT_NAME,
+            )
+        )
+        validate_many = Record.objects.validate_many
+        validated = []
+
+        def validate_late(records):
+            # The collision is not visible on the first validation
+            validated.append(records)
+            if len(validated) == 1:
+                return [None] * len(records)
+            return validate_many(records)
+
+        with patch.object(RecordQuerySet, 'update', side_effect=error), \
+                patch.object(Record.objects, 'validate_many',
+                             side_effect=validate_late):
+            response = self.client.patch(
+                self.url + self.window,
+                dict(offset='3 00:00:00'),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual([bool(e) for e in response.data], [
+            True, True, False,
+        ])
+
+        # The error is raised when the collided record has gone
+        with patch.object(RecordQuerySet, 'update', side_effect=error):
+            self.assertRaises(
+                IntegrityError,
+                self.client.patch, self.url + self.window,
+                dict(offset='5 00:00:00'), format='json',
+            )
+        self.assertEqual(
+            list(Record.objects.filter(thing=self.thing)),
+            self.records,
+        )
+        self.assertEqual(
+            Record.objects.get(pk=self.records[2].pk).start_at,
+            self.records[2].start_at,
+        )
+
+    def test_shift_reassigned_concurrently(self):
+        record = self.records[3]
+        self.client.force_authenticate(self.user)
+        with self.reassign_after_check(record):
+            response = self.client.patch(
+                self.url + self.window,
+                dict(offset='5 00:00:00'),
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [r['pk'] for r in response.data],
+            [self.records[2].pk, self.records[4].pk],
+        )
+        self.assertEqual(
+            Record.objects.get(pk=record.pk).start_at,
+            record.start_at,
+        )
+
+    def test_shift_invalid_offset(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(
+            self.url + self.window,
+            dict(offset='00:00:00'),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn('offset', response.data)
+
+        # An offset out of the range of dates
+        for offset in ('999999999 00:00:00', '-999999999 00:00:00'):
+            response = self.client.patch(
+                self.url + self.window,
+                dict(offset=offset),
+                format='json',
+            )
+            self.assertEqual(response.status_code, 400, response.data)
+            self.assertEqual([bool(e) for e in response.data], [
+                True, True, True,
+            ])
+        self.assertEqual(
+            list(Record.objects.filter(thing=self.thing)),
+            self.records,
+        )
+        self.assertEqual(
+            Record.objects.get(pk=self.records[2].pk).start_at,
+            self.records[2].start_at,
+        )
+
+
+class RecordExportAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-export'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        self.records = [
+            RecordFactory(
+                thing=self.thing,
+                start_at=self.anchor + datetime.timedelta(hours=i * 2),
+                end_at=self.anchor + datetime.timedelta(hours=i * 2 + 1),
+            )
+            for i in range(5)
+        ]
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+
+    def get_json(self, response):
+        return json.loads(b''.join(response.streaming_content).decode())
+
+    def test_export(self):
+        list_url = reverse('reservations-api:records-list', kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        for chunk_size in (1, 2, 5, 100):
+            with patch.object(views.RecordExportAPIView,
+                              'chunk_size', chunk_size):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(
+                self.get_json(response),
+                json.loads(self.client.get(list_url).content.decode()),
+            )
+
+    def test_export_filter(self):
+        response = self.client.get(self.url, dict(
+            since=(self.anchor + datetime.timedelta(hours=3)).isoformat(),
+            until=(self.anchor + datetime.timedelta(hours=4)).isoformat(),
+        ))
+        self.assertEqual(
+            [r['pk'] for r in self.get_json(response)],
+            [self.records[1].pk, self.records[2].pk],
+        )
+        response = self.client.get(self.url, dict(
+            since=(self.anchor + datetime.timedelta(days=3)).isoformat(),
+        ))
+        self.assertEqual(self.get_json(response), [])
+
+    def test_export_not_found(self):
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk='invalid'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class RecordCalendarAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-calendar'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        self.records = [
+            RecordFactory(
+                thing=self.thing,
+                start_at=self.anchor + datetime.timedelta(days=i),
+                end_at=self.anchor + datetime.timedelta(days=i, hours=1),
+            )
+            for i in range(5)
+        ]
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+        self.since = (self.anchor + datetime.timedelta(days=2)).isoformat()
+
+    def get_content(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_calendar(self):
+        response = self.client.get(self.url, dict(since=self.since))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        content = self.get_content(response)
+        self.assertEqual(content.count('BEGIN:VEVENT'), 3)
+        for record in self.records[2:]:
+            self.assertIn('UID:%s@%s' % (record.pk, self.thing.pk), content)
+
+        # The default window is bounded
+        response = self.client.get(self.url)
+        self.assertNotIn('BEGIN:VEVENT', self.get_content(response))
+
+    def test_calendar_suffix(self):
+        url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+            format='ics',
+        ))
+        response = self.client.get(url, dict(since=self.since))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response).count('BEGIN:VEVENT'), 3)
+
+    def test_calendar_since_min(self):
+        response = self.client.get(self.url, dict(
+            since='0001-01-01T00:00:00Z',
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response).count('BEGIN:VEVENT'), 5)
+
+    def test_calendar_cached(self):
+        response = self.client.get(self.url, dict(since=self.since))
+        content = self.get_content(response)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, dict(since=self.since))
+            self.assertEqual(self.get_content(response), content)
+            response = self.client.get(
+                self.url, dict(since=self.since), HTTP_IF_NONE_MATCH=etag,
+            )
+            self.assertEqual(response.status_code, 304)
+
+        self.records[-1].delete()
+        response = self.client.get(
+            self.url, dict(since=self.since), HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response).count('BEGIN:VEVENT'), 2)
+
+    def test_calendar_invalid(self):
+        response = self.client.get(self.url, dict(since='invalid'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', json.loads(response.content.decode()))
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk='invalid'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+class RecordChangesAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:records-changes'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.thing = ThingFactory()
+        self.records = [
+            RecordFactory(
+                thing=self.thing,
+                start_at=datetime.datetime(2014, 1, i, 0, tzinfo=UTC),
+                end_at=datetime.datetime(2014, 1, i, 1, tzinfo=UTC),
+            )
+            for i in range(1, 4)
+        ]
+        self.url = reverse(self.URL_NAME, kwargs=dict(
+            thing_pk=self.thing.pk,
+        ))
+
+    def get_changes(self, version):
+        response = self.client.get(self.url, dict(since_version=version))
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_changes(self):
+        data = self.get_changes(0)
+        self.assertEqual(list(data.keys()), ['version', 'records', 'deleted'])
+        self.assertEqual(
+            [r['pk'] for r in data['records']],
+            [r.pk for r in self.records],
+        )
+        self.assertEqual(data['deleted'], [])
+
+        # Changes older than the margin are not returned again
+        margin = views.RecordChangesAPIView.sync_margin
+        version = data['version'] + int(margin.total_seconds() * 1000000)
+        record = self.records[1]
+        record.name = 'A renamed record'
+        record.save()
+        deleted = self.records[2].pk
+        self.records[2].delete()
+        with self.assertNumQueries(2):
+            data = self.get_changes(version)
+        self.assertEqual(
+            [r['name'] for r in data['records']],
+            ['A renamed record'],
+        )
+        self.assertEqual(data['deleted'], [deleted])
+
+    def test_changes_expired(self):
+        response = self.client.get(self.url, dict(since_version=1))
+        self.assertEqual(response.status_code, 410)
+        response = self.client.get(self.url, dict(since_version=10 ** 30))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes_not_found(self):
+        version = self.get_changes(0)['version']
+        url = reverse(self.URL_NAME, kwargs=dict(thing_pk='invalid'))
+        response = self.client.get(url, dict(since_version=version))
+        self.assertEqual(response.status_code, 404)
+
+
+class ThingBatchAPIView(APIViewTestCase):
+    URL_NAME = 'reservations-api:things-batch'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        self.things = [ThingFactory() for i in range(3)]
+        self.records = [
+            [
+                RecordFactory(
+                    thing=thing,
+                    start_at=self.anchor + datetime.timedelta(days=i),
+                    end_at=self.anchor + datetime.timedelta(days=i, hours=1),
+                )
+                for i in range(3)
+            ]
+            for thing in self.things
+        ]
+        self.url = reverse(self.URL_NAME)
+        self.query = dict(
+            since=self.anchor.isoformat(),
+            until=(self.anchor + datetime.timedelta(days=1)).isoformat(),
+        )
+
+    def test_batch(self):
+        things = self.things[::-1]
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, dict(
+                self.query,
+                things=','.join(t.pk for t in things),
+            ))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [e['thing']['pk'] for e in response.data],
+            [t.pk for t in things],
+        )
+        self.assertEqual(list(response.data[0]['thing'].keys()), [
+            'pk', 'name', 'remarks', 'thumbnail', 'owner',
+        ])
+        for entry, records in zip(response.data, self.records[::-1]):
+            self.assertEqual(
+                [r['pk'] for r in entry['records']],
+                [r.pk for r in records[:2]],
+            )
+
+    def test_batch_missing(self):
+        things = ','.join(t.pk for t in self.things)
+        thing_pk = self.things[1].pk
+        self.things[1].delete()
+        response = self.client.get(self.url, dict(self.query, things=things))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotIn(thing_pk, [e['thing']['pk'] for e in response.data])
+        self.assertEqual(len(response.data), 2)
+
+    def test_batch_since_min(self):
+        response = self.client.get(self.url, dict(
+            self.query,
+            since='0001-01-01T00:00:00Z',
+            things=','.join(t.pk for t in self.things),
+        ))
+        self.assertEqual(response.status_code, 200, response.data)
+        for entry, records in zip(response.data, self.records):
+            self.assertEqual(
+                [r['pk'] for r in entry['records']],
+                [r.pk for r in records[:2]],
+            )
+
+    def test_batch_invalid(self):
+        response = self.client.get(self.url, self.query)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, dict(self.query, things='!'))
+        self.assertEqual(response.status_code, 400)
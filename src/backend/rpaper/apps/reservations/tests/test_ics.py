@@ -0,0 +1,45 @@
+import datetime
+from pytz import UTC
+from django.test import TestCase
+from ..ics import (
+    MAX_LINE_OCTETS,
+    escape_text,
+    fold_line,
+    build_event,
+    iter_calendar,
+)
+
+
+class ICalendarTestCase(TestCase):
+    def test_escape_text(self):
+        self.assertEqual(
+            escape_text('a,b;c\\d\ne'),
+            'a\\,b\\;c\\\\d\\ne',
+        )
+
+    def test_fold_line(self):
+        self.assertEqual(fold_line('SUMMARY:short'), 'SUMMARY:short\r\n')
+        line = 'SUMMARY:' + 'あ' * 40
+        folded = fold_line(line)
+        lines = folded.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        for l in lines[:-1]:
+            self.assertLessEqual(len(l.encode('utf-8')), MAX_LINE_OCTETS)
+        self.assertTrue(all(l.startswith(' ') for l in lines[1:-1]))
+        self.assertEqual(
+            ''.join(l[1:] if i else l for i, l in enumerate(lines)),
+            line,
+        )
+
+    def test_iter_calendar(self):
+        start_at = datetime.datetime(2014, 1, 1, 10, 0, 0, tzinfo=UTC)
+        event = build_event(
+            'uid', 'A meeting', start_at,
+            start_at + datetime.timedelta(hours=1), start_at,
+        )
+        calendar = ''.join(iter_calendar('A thing', [event]))
+        self.assertTrue(calendar.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(calendar.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('DTSTART:20140101T100000Z\r\n', calendar)
+        self.assertIn('DTEND:20140101T110000Z\r\n', calendar)
+        self.assertNotIn('DESCRIPTION', calendar)
@@ -2,8 +2,11 @@ from django.test import TestCase, RequestFactory
 from django.contrib.auth.models import AnonymousUser
 
 from ..middleware import (
+    MAX_CREDENTIALS,
     RecordCredentialMiddleware,
     get_record_credential,
+    get_record_credentials,
+    parse_record_credentials,
 )
 from .factories import UserFactory
 
@@ -12,34 +15,78 @@ class RecordCredentialMiddlewareTestCase(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
 
+    def get_credentials(self, request):
+        credentials = []
+
+        def get_response(request):
+            credentials.append(get_record_credential())
+
+        middleware = RecordCredentialMiddleware(get_response)
+        middleware(request)
+        # The credential is cleared after the response
+        credentials.append(get_record_credential())
+        return credentials
+
     def test_anonymous_user(self):
-        middleware = RecordCredentialMiddleware(lambda response: None)
         request = self.factory.get('/')
         request.user = AnonymousUser()
 
-        middleware(request)
-        self.assertEqual(get_record_credential(), None)
+        self.assertEqual(self.get_credentials(request), [None, None])
 
         request.META['X-RESERVATIONS-RECORD-CREDENTIAL'] = 'foobar'
-        middleware(request)
-        self.assertEqual(get_record_credential(), 'foobar')
+        self.assertEqual(self.get_credentials(request), ['foobar', None])
 
         del request.META['X-RESERVATIONS-RECORD-CREDENTIAL']
-        middleware(request)
-        self.assertEqual(get_record_credential(), None)
+        self.assertEqual(self.get_credentials(request), [None, None])
 
     def test_authenticated_user(self):
-        middleware = RecordCredentialMiddleware(lambda response: None)
         request = self.factory.get('/')
         request.user = UserFactory()
 
-        middleware(request)
-        self.assertEqual(get_record_credential(), None)
+        self.assertEqual(self.get_credentials(request), [None, None])
 
         request.META['X-RESERVATIONS-RECORD-CREDENTIAL'] = 'foobar'
-        middleware(request)
-        self.assertEqual(get_record_credential(), 'foobar')
+        self.assertEqual(self.get_credentials(request), ['foobar', None])
 
         del request.META['X-RESERVATIONS-RECORD-CREDENTIAL']
-        middleware(request)
+        self.assertEqual(self.get_credentials(request), [None, None])
+
+    def test_exception(self):
+        def get_response(request):
+            raise ValueError
+
+        middleware = RecordCredentialMiddleware(get_response)
+        request = self.factory.get('/')
+        request.META['X-RESERVATIONS-RECORD-CREDENTIAL'] = 'foobar'
+        with self.assertRaises(ValueError):
+            middleware(request)
         self.assertEqual(get_record_credential(), None)
+
+    def test_record_credentials(self):
+        c1 = '6f1c3b5e-8f0a-4c5e-9d3a-2b1e4f6a7c8d'
+        credentials = []
+
+        def get_response(request):
+            credentials.append(get_record_credentials())
+
+        middleware = RecordCredentialMiddleware(get_response)
+        request = self.factory.get('/')
+        request.META['X-RESERVATIONS-RECORD-CREDENTIAL'] = '%s,foobar' % c1
+        middleware(request)
+        self.assertEqual(credentials, [(c1,)])
+        # Parsed credentials are cleared after the response as well
+        self.assertEqual(get_record_credentials(), ())
+
+    def test_parse_record_credentials(self):
+        c1 = '6f1c3b5e-8f0a-4c5e-9d3a-2b1e4f6a7c8d'
+        c2 = '0A1B2C3D4E5F60718293A4B5C6D7E8F9'
+        self.assertEqual(parse_record_credentials(None), ())
+        self.assertEqual(parse_record_credentials('foobar'), ())
+        self.assertEqual(
+            parse_record_credentials('%s, foobar,%s' % (c1, c2)),
+            (c1, '0a1b2c3d-4e5f-6071-8293-a4b5c6d7e8f9'),
+        )
+        self.assertEqual(
+            len(parse_record_credentials(','.join([c1] * 1000))),
+            MAX_CREDENTIALS,
+        )
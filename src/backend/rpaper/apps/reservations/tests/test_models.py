@@ -2,6 +2,8 @@ import datetime
 from unittest.mock import patch
 from pytz import UTC
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import IntegrityError, connection
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AnonymousUser
 from .factories import (
@@ -12,7 +14,10 @@ from .factories import (
 from ..models import (
     Thing,
     Record,
+    RecordTombstone,
 )
+from ..cache import get_thing_version
+from ..middleware import parse_record_credentials
 
 
 class ThingModelTestCase(TestCase):
@@ -74,6 +79,34 @@ class RecordModelTestCase(TestCase):
         i3 = RecordFactory.build()
         self.assertEqual(i3.pk, None)
 
+    def test_pk_from_db(self):
+        i1 = RecordFactory()
+        pk = i1.pk
+        field = Record._meta.pk
+        with patch.object(field, 'decode_hashids') as decode_hashids, \
+                patch.object(field, 'encode_hashids',
+                             wraps=field.encode_hashids) as encode_hashids:
+            i2 = Record.objects.get(pk=pk)
+            self.assertEqual(i2.pk, pk)
+            self.assertEqual(i2.hashid, pk)
+            self.assertEqual(i2.__dict__['hashid'], i1.__dict__['hashid'])
+            i2.save()
+            decode_hashids.assert_not_called()
+            self.assertEqual(encode_hashids.call_count, 1)
+
+    def test_pk_in(self):
+        i1 = RecordFactory()
+        i2 = RecordFactory()
+        RecordFactory()
+        qs = Record.objects.filter(pk__in=[i1.pk, i2.pk])
+        self.assertEqual(set(qs), {i1, i2})
+
+        self.assertRaises(
+            AttributeError,
+            Record.objects.filter,
+            pk__in=[i1.pk, 'invalid'],
+        )
+
     def test_permissions(self):
         user1 = UserFactory()
         user2 = UserFactory()
@@ -97,9 +130,9 @@ class RecordModelTestCase(TestCase):
         # NOTE
         # The record has created by an authenticated user.
         # In this case, 'credential' doesn't give any permissions.
-        path = 'rpaper.apps.reservations.perms.get_record_credential'
-        with patch(path) as get_record_credential:
-            get_record_credential.return_value = None
+        path = 'rpaper.apps.reservations.perms.get_record_credentials'
+        with patch(path) as get_record_credentials:
+            get_record_credentials.return_value = ()
             self.assertTrue(has_perm(user1, 'change', record))
             self.assertFalse(has_perm(user2, 'change', record))
             self.assertFalse(has_perm(user3, 'change', record))
@@ -110,8 +143,8 @@ class RecordModelTestCase(TestCase):
             del user1._logical_perms_cache
             del user2._logical_perms_cache
             del user3._logical_perms_cache
-            get_record_credential.return_value = str(
-                record.credential
+            get_record_credentials.return_value = (
+                str(record.credential),
             )
             self.assertTrue(has_perm(user1, 'change', record))
             self.assertFalse(has_perm(user2, 'change', record))
@@ -120,6 +153,40 @@ class RecordModelTestCase(TestCase):
             self.assertFalse(has_perm(user2, 'delete', record))
             self.assertFalse(has_perm(user3, 'delete', record))
 
+    def test_permissions_with_credentials(self):
+        user = AnonymousUser()
+        record = RecordFactory()
+        path = 'rpaper.apps.reservations.perms.get_record_credentials'
+        with patch(path) as get_record_credentials:
+            get_record_credentials.return_value = parse_record_credentials(
+                ','.join([
+                    '6f1c3b5e-8f0a-4c5e-9d3a-2b1e4f6a7c8d',
+                    str(record.credential).upper(),
+                ])
+            )
+            self.assertTrue(user.has_perm('reservations.change_record', record))
+            del user._logical_perms_cache
+            get_record_credentials.return_value = (
+                '6f1c3b5e-8f0a-4c5e-9d3a-2b1e4f6a7c8d',
+            )
+            self.assertFalse(user.has_perm('reservations.change_record', record))
+
+    def test_permissions_without_owner_lookup(self):
+        user = UserFactory()
+        record = RecordFactory(owner=user, thing=ThingFactory(owner=user))
+        record = Record.objects.get(pk=record.pk)
+        thing = Thing.objects.get(pk=record.thing_id)
+        # Owners are never fetched to check permissions
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(user.has_perm('reservations.change_record', record))
+            self.assertTrue(user.has_perm('reservations.change_thing', thing))
+            self.assertFalse(AnonymousUser().has_perm(
+                'reservations.change_record', record,
+            ))
+        self.assertFalse([
+            q for q in context.captured_queries if 'auth_user' in q['sql']
+        ])
+
     def test_permissions_with_credential(self):
         user1 = UserFactory()
         user2 = UserFactory()
@@ -144,9 +211,9 @@ class RecordModelTestCase(TestCase):
         # The record has created by an anonymous user.
         # In this case, 'credential' give permissions to user who know the
         # 'credential'.
-        path = 'rpaper.apps.reservations.perms.get_record_credential'
-        with patch(path) as get_record_credential:
-            get_record_credential.return_value = None
+        path = 'rpaper.apps.reservations.perms.get_record_credentials'
+        with patch(path) as get_record_credentials:
+            get_record_credentials.return_value = ()
             self.assertFalse(has_perm(user1, 'change', record))
             self.assertFalse(has_perm(user2, 'change', record))
             self.assertFalse(has_perm(user3, 'change', record))
@@ -157,8 +224,8 @@ class RecordModelTestCase(TestCase):
             del user1._logical_perms_cache
             del user2._logical_perms_cache
             del user3._logical_perms_cache
-            get_record_credential.return_value = str(
-                record.credential
+            get_record_credentials.return_value = (
+                str(record.credential),
             )
             self.assertTrue(has_perm(user1, 'change', record))
             self.assertTrue(has_perm(user2, 'change', record))
@@ -188,6 +255,30 @@ class RecordModelTestCase(TestCase):
         )
         self.assertRaises(ValidationError, instance.full_clean)
 
+    def test_save_overlap_constraint_violation(self):
+        start_at = datetime.datetime(2014, 1, 1, 12, 0, 0, tzinfo=UTC)
+        end_at = start_at + datetime.timedelta(hours=1)
+        other = RecordFactory(start_at=start_at, end_at=end_at)
+        record = RecordFactory.build(
+            thing=other.thing,
+            start_at=start_at,
+            end_at=end_at,
+        )
+        # NOTE:
+        # Emulate a concurrent request which has saved 'other' between the
+        # validation and the insertion of 'record'.
+        error = IntegrityError(
+            'conflicting key value violates exclusion constraint "%s"' % (
+                Record.OVERLAP_CONSTRAINT_NAME,
+            )
+        )
+        save = Record.save.__wrapped__
+        with patch('django.db.models.Model.save', side_effect=error):
+            self.assertRaises(ValidationError, save, record)
+        with patch('django.db.models.Model.save',
+                   side_effect=IntegrityError('unknown')):
+            self.assertRaises(IntegrityError, save, record)
+
     def test_is_collided(self):
         start_at = datetime.datetime(2014, 1, 1, 12, 0, 0, tzinfo=UTC)
         end_at = start_at + datetime.timedelta(hours=1)
@@ -251,6 +342,19 @@ class RecordModelTestCase(TestCase):
         )))
 
 
+    @patch('django.db.transaction.on_commit')
+    def test_cache_invalidated_on_commit(self, on_commit):
+        record = RecordFactory()
+        version, modified = get_thing_version(record.thing_id)
+        record.name = 'A renamed record'
+        record.save()
+        # The version is kept until the transaction commits
+        self.assertEqual(get_thing_version(record.thing_id)[0], version)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertNotEqual(get_thing_version(record.thing_id)[0], version)
+
+
 class RecordManagerTestCase(TestCase):
     def setUp(self):
         self.thing = ThingFactory()
@@ -326,3 +430,50 @@ class RecordManagerTestCase(TestCase):
             repr(self.records[46]),
             repr(self.records[47]),
         ])
+
+    def test_collide_with_exclude_itself(self):
+        record = self.records[47]
+        qs = Record.objects.collide_with(record)
+        self.assertEqual(qs.count(), 0)
+
+        record.end_at = self.anchor + datetime.timedelta(hours=2)
+        qs = Record.objects.collide_with(record)
+        self.assertQuerysetEqual(qs.all(), [
+            repr(self.records[48]),
+        ])
+
+    def test_collide_with_single_query(self):
+        record = RecordFactory.build(
+            thing=self.thing,
+            start_at=self.anchor-datetime.timedelta(hours=2),
+            end_at=self.anchor,
+        )
+        with self.assertNumQueries(1):
+            list(Record.objects.collide_with(record))
+
+
+class RecordTombstoneTestCase(TestCase):
+    def test_record_deleted(self):
+        record = RecordFactory()
+        thing = record.thing
+        pk = record.pk
+        record.delete()
+        tombstones = list(RecordTombstone.objects.of_thing(thing.pk))
+        self.assertEqual(len(tombstones), 1)
+        self.assertEqual(tombstones[0].get_record_display(), pk)
+
+        # Expired tombstones are pruned on the next deletion
+        RecordTombstone.objects.update(
+            deleted_at=tombstones[0].deleted_at - RecordTombstone.RETENTION,
+        )
+        RecordFactory(thing=thing).delete()
+        self.assertEqual(RecordTombstone.objects.of_thing(thing.pk).count(), 1)
+
+    def test_thing_deleted(self):
+        record = RecordFactory(
+            start_at=datetime.datetime(2009, 1, 1, 0, tzinfo=UTC),
+            end_at=datetime.datetime(2009, 1, 1, 1, tzinfo=UTC),
+        )
+        RecordFactory(thing=record.thing).delete()
+        record.thing.delete()
+        self.assertFalse(RecordTombstone.objects.exists())
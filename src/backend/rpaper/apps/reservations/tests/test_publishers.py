@@ -0,0 +1,86 @@
+import json
+import datetime
+from unittest.mock import patch
+from pytz import UTC
+from django.test import TestCase
+from .factories import ThingFactory, RecordFactory
+from ..models import Record
+from ..publishers import (
+    RECORD_CREATED,
+    RECORD_UPDATED,
+    RECORD_DELETED,
+    build_record_change,
+)
+
+
+class RecordChangeTestCase(TestCase):
+    def test_build_record_change(self):
+        record = RecordFactory()
+        message = json.loads(build_record_change(RECORD_CREATED, record))
+        self.assertEqual(message['action'], RECORD_CREATED)
+        self.assertEqual(list(message['record'].keys()), [
+            'thing', 'pk', 'name', 'contact', 'remarks',
+            'start_at', 'end_at',
+        ])
+        self.assertEqual(message['record']['pk'], record.pk)
+
+        message = json.loads(build_record_change(RECORD_DELETED, record))
+        self.assertEqual(message, {
+            'action': RECORD_DELETED,
+            'record': {'thing': record.thing_id, 'pk': record.pk},
+        })
+
+    @patch('rpaper.apps.reservations.publishers.publish_record_change')
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_publish_on_commit(self, on_commit, publish_record_change):
+        record = RecordFactory()
+        publish_record_change.assert_called_once_with(
+            record.thing_id,
+            build_record_change(RECORD_CREATED, record),
+        )
+        publish_record_change.reset_mock()
+        thing_pk, pk = record.thing_id, record.pk
+        record.delete()
+        self.assertEqual(publish_record_change.call_count, 1)
+        args, kwargs = publish_record_change.call_args
+        self.assertEqual(args[0], thing_pk)
+        self.assertEqual(json.loads(args[1]), {
+            'action': RECORD_DELETED,
+            'record': {'thing': thing_pk, 'pk': pk},
+        })
+
+    @patch('rpaper.apps.reservations.publishers.publish_record_change')
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_publish_bulk_create(self, on_commit, publish_record_change):
+        thing = ThingFactory()
+        anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        records = Record.objects.bulk_create([
+            RecordFactory.build(
+                thing=thing,
+                start_at=anchor+datetime.timedelta(hours=i),
+                end_at=anchor+datetime.timedelta(hours=i+1),
+            )
+            for i in range(3)
+        ])
+        self.assertEqual(publish_record_change.call_count, 3)
+        for record, (args, kwargs) in zip(
+                records, publish_record_change.call_args_list):
+            self.assertEqual(args, (
+                thing.pk,
+                build_record_change(RECORD_CREATED, record),
+            ))
+
+    @patch('rpaper.apps.reservations.publishers.publish_record_change')
+    @patch('django.db.transaction.on_commit', side_effect=lambda f: f())
+    def test_publish_shift_many(self, on_commit, publish_record_change):
+        anchor = datetime.datetime(2014, 1, 1, 0, 0, 0, tzinfo=UTC)
+        record = RecordFactory(
+            start_at=anchor,
+            end_at=anchor+datetime.timedelta(hours=1),
+        )
+        publish_record_change.reset_mock()
+        Record.objects.shift_many([record], datetime.timedelta(hours=1))
+        publish_record_change.assert_called_once_with(
+            record.thing_id,
+            build_record_change(RECORD_UPDATED, record),
+        )
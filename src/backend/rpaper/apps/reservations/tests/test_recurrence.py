@@ -0,0 +1,73 @@
+import datetime
+import pytz
+from pytz import UTC
+from django.test import TestCase
+from django.utils import timezone
+from ..recurrence import (
+    DAILY,
+    WEEKLY,
+    MAX_OCCURRENCES,
+    TooManyOccurrences,
+    expand_recurrence,
+)
+
+
+class ExpandRecurrenceTestCase(TestCase):
+    def setUp(self):
+        self.start_at = datetime.datetime(2014, 1, 1, 9, 0, tzinfo=UTC)
+        self.end_at = datetime.datetime(2014, 1, 1, 11, 0, tzinfo=UTC)
+
+    def test_expand_with_count(self):
+        occurrences = list(expand_recurrence(
+            self.start_at, self.end_at, WEEKLY, count=3,
+        ))
+        self.assertEqual(occurrences, [
+            (self.start_at + datetime.timedelta(weeks=i),
+             self.end_at + datetime.timedelta(weeks=i))
+            for i in range(3)
+        ])
+
+    def test_expand_with_until(self):
+        occurrences = list(expand_recurrence(
+            self.start_at, self.end_at, DAILY, interval=2,
+            until=self.start_at + datetime.timedelta(days=5),
+        ))
+        self.assertEqual([o[0].day for o in occurrences], [1, 3, 5])
+
+    def test_expand_is_limited(self):
+        occurrences = list(expand_recurrence(
+            self.start_at, self.end_at, DAILY,
+            until=self.start_at + datetime.timedelta(
+                days=MAX_OCCURRENCES - 1,
+            ),
+        ))
+        self.assertEqual(len(occurrences), MAX_OCCURRENCES)
+        # Rules are never truncated silently
+        with self.assertRaises(TooManyOccurrences):
+            list(expand_recurrence(
+                self.start_at, self.end_at, DAILY,
+                until=self.start_at + datetime.timedelta(days=1000),
+            ))
+        with self.assertRaises(TooManyOccurrences):
+            list(expand_recurrence(
+                self.start_at, self.end_at, DAILY,
+                count=MAX_OCCURRENCES + 1,
+            ))
+
+    def test_expand_keeps_wall_clock(self):
+        tz = pytz.timezone('Europe/Berlin')
+        start_at = tz.localize(datetime.datetime(2014, 3, 24, 9, 0))
+        end_at = tz.localize(datetime.datetime(2014, 3, 24, 10, 0))
+        with timezone.override(tz):
+            occurrences = list(expand_recurrence(
+                start_at, end_at, WEEKLY, count=2,
+            ))
+        # DST begins on 2014-03-30 in Europe/Berlin
+        self.assertEqual(
+            [timezone.localtime(o[0], tz).hour for o in occurrences],
+            [9, 9],
+        )
+        self.assertEqual(
+            occurrences[1][0] - occurrences[0][0],
+            datetime.timedelta(weeks=1, hours=-1),
+        )
@@ -1,22 +1,74 @@
+from functools import lru_cache
 from hashids import Hashids
 from django.db import models
+from django.db.models.lookups import In
 from django.utils.translation import ugettext_lazy as _
 
 
+# The maximum number of int <-> hashid pairs memoized per direction
+HASHIDS_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=None)
+def _get_hashids(salt, min_length):
+    return Hashids(salt=salt, min_length=min_length)
+
+
+@lru_cache(maxsize=HASHIDS_CACHE_SIZE)
+def _encode_hashids(salt, min_length, value):
+    return _get_hashids(salt, min_length).encode(value)
+
+
+@lru_cache(maxsize=HASHIDS_CACHE_SIZE)
+def _decode_hashids(salt, min_length, value):
+    return _get_hashids(salt, min_length).decode(value)
+
+
+class Hashid(str):
+    """A hashid string which carries the integer it has encoded from"""
+
+    def __new__(cls, value, number, key):
+        instance = super().__new__(cls, value)
+        instance.number = number
+        # The integer is valid only for fields with same salt and min_length
+        instance.key = key
+        return instance
+
+    def __getnewargs__(self):
+        return (str(self), self.number, self.key)
+
+
 class HashidsDescriptor:
     def __init__(self, field):
         self.field = field
+        self.cache_name = '_%s_encoded' % field.name
 
     def __get__(self, instance, cls=None):
         if instance is None:
             return self
-        value = instance.__dict__.get(self.field.name, None)
-        return None if value is None else self.field.encode_hashids(value)
+        hashid = instance.__dict__.get(self.cache_name, None)
+        if hashid is None:
+            value = instance.__dict__.get(self.field.name, None)
+            if value is None:
+                return None
+            hashid = self.field.to_python(value)
+            instance.__dict__[self.cache_name] = hashid
+        return hashid
 
     def __set__(self, instance, value):
-        # Translate hashid into an integer if necessary
-        if isinstance(value, str):
-            value = self.field.decode_hashids(value)
+        # Keep both an integer and a hashid on the instance. A hashid is
+        # decoded (or an integer is encoded) only when it is not known yet.
+        if isinstance(value, Hashid) and value.key == self.field.hashids_key:
+            instance.__dict__[self.cache_name] = value
+            value = value.number
+        elif isinstance(value, str):
+            number = self.field.decode_hashids(value)
+            instance.__dict__[self.cache_name] = Hashid(
+                value, number, self.field.hashids_key,
+            )
+            value = number
+        else:
+            instance.__dict__.pop(self.cache_name, None)
         instance.__dict__[self.field.name] = value
 
 
@@ -55,38 +107,41 @@ class HashidsField(models.BigAutoField):
             raise AttributeError(
                 "Non integer value %s is stored in db." % value,
             )
-        return self.encode_hashids(value)
+        return Hashid(self.encode_hashids(value), value, self.hashids_key)
 
     def to_python(self, value):
         if value is None:
             return None
         elif isinstance(value, str):
             return value
-        return self.encode_hashids(value)
+        return Hashid(self.encode_hashids(value), value, self.hashids_key)
 
     def get_prep_value(self, value):
-        if not isinstance(value, str):
+        if isinstance(value, Hashid) and value.key == self.hashids_key:
+            return super().get_prep_value(value.number)
+        elif not isinstance(value, str):
             raise AttributeError(
                 "Unexpected value %s has specified." % value,
             )
         value = self.decode_hashids(value)
         return super().get_prep_value(value)
 
+    @property
+    def hashids_key(self):
+        return (self.hashids_salt, self.hashids_min_length)
+
     def get_hashids(self):
-        if not hasattr(self, '_hashids'):
-            self._hashids = Hashids(
-                salt=self.hashids_salt,
-                min_length=self.hashids_min_length
-            )
-        return self._hashids
+        return _get_hashids(self.hashids_salt, self.hashids_min_length)
 
     def encode_hashids(self, value):
-        hashids = self.get_hashids()
-        return hashids.encode(value)
+        return _encode_hashids(
+            self.hashids_salt, self.hashids_min_length, value,
+        )
 
     def decode_hashids(self, value):
-        hashids = self.get_hashids()
-        numbers = hashids.decode(value)
+        numbers = _decode_hashids(
+            self.hashids_salt, self.hashids_min_length, value,
+        )
         if len(numbers) != 1:
             raise AttributeError(
                 "An invalid hashid %s has specified (%s)" % (
@@ -94,3 +149,39 @@ class HashidsField(models.BigAutoField):
                 )
             )
         return numbers[0]
+
+    def encode_many(self, values):
+        """Return a list of hashids encoded from integers"""
+        salt = self.hashids_salt
+        min_length = self.hashids_min_length
+        return [_encode_hashids(salt, min_length, v) for v in values]
+
+    def decode_many(self, values):
+        """Return a list of integers decoded from hashids"""
+        key = self.hashids_key
+        numbers = [
+            (v.number,) if isinstance(v, Hashid) and v.key == key else
+            _decode_hashids(key[0], key[1], v)
+            for v in values
+        ]
+        for value, n in zip(values, numbers):
+            if len(n) != 1:
+                raise AttributeError(
+                    "An invalid hashid %s has specified (%s)" % (
+                        value, n,
+                    )
+                )
+        return [n[0] for n in numbers]
+
+
+@HashidsField.register_lookup
+class HashidsIn(In):
+    """An 'in' lookup which decodes all hashids in a batch"""
+
+    def get_prep_lookup(self):
+        if hasattr(self.rhs, '_prepare'):
+            return super().get_prep_lookup()
+        values = list(self.rhs)
+        if not all(isinstance(v, str) for v in values):
+            return super().get_prep_lookup()
+        return self.lhs.output_field.decode_many(values)
@@ -1,12 +1,40 @@
 from functools import wraps
+from threading import local
+from django.db import transaction
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    # NOTE:
+    # 'contextvars' is available since Python 3.7. Older versions fallback
+    # to a thread-local value which has the same interface.
+    class ContextVar:
+        def __init__(self, name, default=None):
+            self._local = local()
+            self.name = name
+            self.default = default
+
+        def get(self):
+            return getattr(self._local, 'value', self.default)
+
+        def set(self, value):
+            token = self.get()
+            self._local.value = value
+            return token
+
+        def reset(self, token):
+            self._local.value = token
 
 
 def validate_on_save(klass):
     original_save = klass.save
 
     def wrapper(self, *args, **kwargs):
-        klass.full_clean(self)
-        return original_save(self, *args, **kwargs)
+        # Validate and save in a same transaction so that a lock acquired
+        # in a validation is kept until the instance is saved
+        with transaction.atomic(using=kwargs.get('using')):
+            klass.full_clean(self)
+            return original_save(self, *args, **kwargs)
     setattr(klass, 'save', wraps(original_save)(wrapper))
     return klass
 
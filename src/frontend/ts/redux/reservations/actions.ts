@@ -4,7 +4,7 @@ import { Dispatch, ThunkAction } from 'redux';
 import { createAction } from 'redux-actions';
 import {
   Thing,
-  Record, RecordForm, RecordError,
+  Record, RecordForm, RecordError, RecordChange,
   Filter,
   State,
 } from './models';
@@ -62,6 +62,29 @@ export function fetchRecords(param: {pk: string, filter: Filter}): ThunkAction<v
   };
 }
 
+export const RECEIVE_RECORD_CHANGE = 'RECEIVE_RECORD_CHANGE';
+export const receiveRecordChange = createAction<RecordChange>(RECEIVE_RECORD_CHANGE);
+
+export function subscribeRecords(param: {pk: string}): ThunkAction<WebSocket, {}, {}> {
+  return function (dispatch) {
+    // Changes of records are published to a per-thing ws4redis facility
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const url = `${scheme}://${location.host}/ws/reservations-${param.pk}?subscribe-broadcast`;
+    const ws = new WebSocket(url);
+    ws.onmessage = (event) => {
+      const change = JSON.parse(event.data);
+      if (change.action !== 'deleted') {
+        change.record = Object.assign({}, change.record, {
+          start_at: moment(change.record.start_at),
+          end_at: moment(change.record.end_at),
+        });
+      }
+      dispatch(receiveRecordChange(<RecordChange>change));
+    };
+    return ws;
+  };
+}
+
 export const REQUEST_RECORD = 'REQUEST_RECORD';
 export const requestRecord = createAction<void>(REQUEST_RECORD);
 export const RECEIVE_RECORD = 'RECEIVE_RECORD';
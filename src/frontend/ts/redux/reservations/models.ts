@@ -52,6 +52,11 @@ export interface Record {
   end_at: moment.Moment;
 }
 
+export interface RecordChange {
+  action: 'created' | 'updated' | 'deleted';
+  record: Record;
+}
+
 export interface RecordForm {
   name: string;
   contact: string;
@@ -2,7 +2,8 @@ import * as moment from 'moment';
 import { merge } from 'lodash';
 import { handleActions, Action } from 'redux-actions';
 
-import { Thing, Record, RecordError, Filter, State } from './models';
+import { Thing, Record, RecordError, RecordChange, Filter, State } from './models';
+import { buildFilterParam } from './utils/filter';
 import {
   REQUEST_THING,
   RECEIVE_THING,
@@ -11,6 +12,7 @@ import {
   REQUEST_RECORD,
   RECEIVE_RECORD,
   RECEIVE_RECORD_ERROR,
+  RECEIVE_RECORD_CHANGE,
   SET_FILTER,
 } from './actions';
 
@@ -29,7 +31,18 @@ export const initialState: State = {
 };
 
 
-type Payload = void | Thing | Record | Record[] | Filter;
+type Payload = void | Thing | Record | Record[] | RecordChange | Filter;
+
+function isInFilter(record: Record, filter: Filter): boolean {
+  const param = <{ since?: string, until?: string }>buildFilterParam(filter);
+  if (param.since && record.end_at.isBefore(param.since)) {
+    return false;
+  }
+  if (param.until && record.start_at.isAfter(param.until)) {
+    return false;
+  }
+  return true;
+}
 
 const reducer = handleActions<State, Payload>({
   [REQUEST_THING]: (state: State, action: Action<void>): State => {
@@ -102,6 +115,22 @@ const reducer = handleActions<State, Payload>({
     });
   },
 
+  [RECEIVE_RECORD_CHANGE]: (state: State, action: Action<RecordChange>): State => {
+    const change = action.payload;
+    const records = state.thing.records;
+    // NOTE:
+    // 'merge' merges arrays per index so the items are replaced instead
+    const items = records.items.filter(item => item.pk !== change.record.pk);
+    if (change.action !== 'deleted' && isInFilter(change.record, records.filter)) {
+      items.push(change.record);
+    }
+    return Object.assign({}, state, {
+      thing: Object.assign({}, state.thing, {
+        records: Object.assign({}, records, { items }),
+      }),
+    });
+  },
+
   [SET_FILTER]: (state: State, action: Action<Filter>): State => {
     return merge({}, state, {
       thing: {